@@ -0,0 +1,300 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Callable
+from .config import config
+from .models import AnalyzeRequest
+from .safety import safety_checker
+from .gemini_client import gemini_client
+from .metrics import metrics
+from .locks import file_lock
+from .scheduler import set_priority, ModelBusyError, PRIORITY_BATCH
+
+# SQLite-backed batch job state so jobs survive a server restart
+# Shared by every server process: a document is claimed with a conditional update so only
+# one worker runs it, and claims are tagged with the server run (BOOT_ID) that made them
+# Running documents are kept fresh by a heartbeat, so a claim left by a worker process that
+# died is taken over after BATCH_CLAIM_TIMEOUT_SECONDS
+class BatchStore:
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with file_lock(db_path):
+            self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS batch_jobs (
+                    id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    total INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS batch_documents (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    document_name TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    summary_id TEXT,
+                    error TEXT,
+                    updated_at TEXT,
+                    claimed_by TEXT,
+                    mode TEXT,
+                    PRIMARY KEY (job_id, idx)
+                )
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(batch_documents)")}
+            for column in ('claimed_by', 'mode'):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE batch_documents ADD COLUMN {column} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_batch_documents_status ON batch_documents(status)")
+
+    def create_job(self, documents: List[AnalyzeRequest]) -> str:
+        job_id = f"batch_{uuid.uuid4().hex[:12]}"
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO batch_jobs (id, created_at, total) VALUES (?, ?, ?)",
+                (job_id, now, len(documents)),
+            )
+            self._conn.executemany(
+                "INSERT INTO batch_documents (job_id, idx, document_name, text, mode, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                [(job_id, i, doc.document_name, doc.text, doc.mode, now) for i, doc in enumerate(documents)],
+            )
+        return job_id
+
+    def get_document(self, job_id: str, idx: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM batch_documents WHERE job_id = ? AND idx = ?", (job_id, idx)
+            ).fetchone()
+        return dict(row) if row else None
+
+    # Mark a pending document as running for this server run
+    # Returns: False when another worker got to it first
+    def claim_document(self, job_id: str, idx: int) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE batch_documents SET status = 'running', claimed_by = ?, updated_at = ? "
+                "WHERE job_id = ? AND idx = ? AND status = 'pending'",
+                (config.BOOT_ID, datetime.now().isoformat(), job_id, idx),
+            )
+        return cursor.rowcount == 1
+
+    # Refresh a running document's claim
+    def heartbeat(self, job_id: str, idx: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batch_documents SET updated_at = ? "
+                "WHERE job_id = ? AND idx = ? AND status = 'running'",
+                (datetime.now().isoformat(), job_id, idx),
+            )
+
+    # Put documents whose claim hasn't been refreshed within the timeout back to pending
+    # Returns: [(job_id, idx)] of the documents released
+    def release_stale_claims(self, timeout: float) -> List[tuple]:
+        cutoff = (datetime.now() - timedelta(seconds=timeout)).isoformat()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT job_id, idx FROM batch_documents WHERE status = 'running' AND updated_at < ?",
+                (cutoff,),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE batch_documents SET status = 'pending' WHERE status = 'running' AND updated_at < ?",
+                (cutoff,),
+            )
+        return [(row['job_id'], row['idx']) for row in rows]
+
+    def update_document(self, job_id: str, idx: int, status: str,
+                        summary_id: Optional[str] = None, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batch_documents SET status = ?, summary_id = ?, error = ?, updated_at = ? "
+                "WHERE job_id = ? AND idx = ?",
+                (status, summary_id, error, datetime.now().isoformat(), job_id, idx),
+            )
+
+    # Documents that still need work - anything left "running" by an earlier server run was
+    # interrupted; documents running in this run belong to a sibling worker
+    def unfinished_documents(self) -> List[tuple]:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batch_documents SET status = 'pending' "
+                "WHERE status = 'running' AND (claimed_by IS NULL OR claimed_by != ?)",
+                (config.BOOT_ID,),
+            )
+            rows = self._conn.execute(
+                "SELECT job_id, idx FROM batch_documents WHERE status = 'pending' ORDER BY job_id, idx"
+            ).fetchall()
+        return [(row['job_id'], row['idx']) for row in rows]
+
+    # Job progress with per-document status (without document text)
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            documents = self._conn.execute(
+                "SELECT idx, document_name, status, summary_id, error, updated_at "
+                "FROM batch_documents WHERE job_id = ? ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+
+        documents = [dict(row) for row in documents]
+        counts = {}
+        for doc in documents:
+            counts[doc['status']] = counts.get(doc['status'], 0) + 1
+        finished = counts.get('done', 0) + counts.get('failed', 0)
+
+        return {
+            'id': job['id'],
+            'created_at': job['created_at'],
+            'total': job['total'],
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'status': 'completed' if finished == job['total'] else 'running',
+            'documents': documents,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Runs batch documents through the analysis pipeline with a fixed-size worker pool
+class BatchRunner:
+    def __init__(self):
+        self.store = None
+        self.concurrency = config.BATCH_CONCURRENCY
+        self._queue = None
+        self._workers = []
+        self._reaper = None
+        self._busy = set()
+        self._stopping = False
+        self._on_result = None
+
+    # Start the workers and re-queue unfinished work from before a restart
+    # on_result(request, summary, terms_looked_up, usage_metadata, start_time) saves the
+    # result and returns an object with saved_id
+    def start(self, on_result: Callable):
+        self.store = BatchStore(config.BATCHES_DB)
+        self._on_result = on_result
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._reaper = asyncio.create_task(self._release_stale_claims())
+
+        for job_id, idx in self.store.unfinished_documents():
+            self._queue.put_nowait((job_id, idx))
+
+    # Let documents already running finish (up to SHUTDOWN_GRACE_SECONDS), then stop
+    # Anything cut off is put back to pending for the next start
+    async def stop(self):
+        self._stopping = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for worker in self._workers:
+            if worker not in self._busy:
+                worker.cancel()
+        busy = [worker for worker in self._workers if worker in self._busy]
+        if busy:
+            await asyncio.wait(busy, timeout=config.SHUTDOWN_GRACE_SECONDS)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def submit(self, documents: List[AnalyzeRequest]) -> str:
+        job_id = self.store.create_job(documents)
+        for idx in range(len(documents)):
+            self._queue.put_nowait((job_id, idx))
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        return self.store.get_job(job_id)
+
+    async def _worker(self):
+        task = asyncio.current_task()
+        while not self._stopping:
+            job_id, idx = await self._queue.get()
+            self._busy.add(task)
+            try:
+                await self._run_document(job_id, idx)
+            except asyncio.CancelledError:
+                self.store.update_document(job_id, idx, 'pending')
+                raise
+            except ModelBusyError as e:
+                # Out of quota - put the document back and let this worker cool down
+                self.store.update_document(job_id, idx, 'pending')
+                self._queue.put_nowait((job_id, idx))
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                self.store.update_document(job_id, idx, 'failed', error=str(e))
+            finally:
+                self._busy.discard(task)
+                self._queue.task_done()
+
+    # Keep a running document's claim fresh until the task is cancelled
+    async def _heartbeat(self, job_id: str, idx: int):
+        while True:
+            await asyncio.sleep(config.BATCH_CLAIM_TIMEOUT_SECONDS / 4)
+            self.store.heartbeat(job_id, idx)
+
+    # Periodically take over documents whose worker process stopped sending heartbeats
+    # Every process runs this; the conditional claim makes sure only one picks each document up
+    async def _release_stale_claims(self):
+        while True:
+            await asyncio.sleep(config.BATCH_CLAIM_TIMEOUT_SECONDS / 2)
+            try:
+                released = self.store.release_stale_claims(config.BATCH_CLAIM_TIMEOUT_SECONDS)
+            except Exception as e:
+                print(f"Error releasing stale batch claims: {e}")
+                continue
+            for job_id, idx in released:
+                metrics.increment("batch_claims_released_total")
+                self._queue.put_nowait((job_id, idx))
+
+    async def _run_document(self, job_id: str, idx: int):
+        doc = self.store.get_document(job_id, idx)
+        if doc is None or not self.store.claim_document(job_id, idx):
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, idx))
+        try:
+            await self._analyze_document(job_id, idx, doc)
+        finally:
+            heartbeat.cancel()
+
+    async def _analyze_document(self, job_id: str, idx: int, doc: Dict):
+        start_time = time.time()
+        metrics.start_request()
+        # Interactive requests are sent to Gemini ahead of batch work
+        set_priority(PRIORITY_BATCH)
+        request = AnalyzeRequest(text=doc['text'], document_name=doc['document_name'], mode=doc['mode'])
+
+        with metrics.span("safety_check"):
+            valid, error_msg = safety_checker.validate_input(request.text)
+        if not valid:
+            self.store.update_document(job_id, idx, 'failed', error=error_msg)
+            return
+
+        summary, terms_looked_up, usage_metadata = await gemini_client.analyze_document_async(request.text, request.mode)
+        response = self._on_result(request, summary, terms_looked_up, usage_metadata, start_time)
+        self.store.update_document(job_id, idx, 'done', summary_id=response.saved_id)
+
+batch_runner = BatchRunner()
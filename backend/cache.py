@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+from .config import config
+from .metrics import metrics
+
+# Disk eviction trims the cache to this share of its limit, so the directory is listed once
+# every few hundred writes rather than on every write once the cache is full
+DISK_EVICT_TARGET = 0.9
+
+# Collapse whitespace so re-uploads of the same document share a cache key
+def normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+# Two-tier (memory LRU + disk) cache for finished analyses
+# name labels its metrics ("analysis" for whole documents, "clause" for clause-mode pieces)
+class AnalysisCache:
+    def __init__(self, name: str = "analysis", cache_dir: str = config.ANALYSIS_CACHE_DIR):
+        self.name = name
+        self.enabled = config.ANALYSIS_CACHE_ENABLED
+        self.cache_dir = cache_dir
+        self.max_memory_entries = config.ANALYSIS_CACHE_MAX_ENTRIES
+        self.max_disk_entries = config.ANALYSIS_CACHE_MAX_DISK_ENTRIES
+        self.ttl_seconds = config.ANALYSIS_CACHE_TTL_SECONDS
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Approximate number of entries on disk (None until the directory is first listed)
+        self._disk_entries = None
+        self.hits = 0
+        self.misses = 0
+
+    # Build a content-addressed key from everything that affects the model output
+    @staticmethod
+    def make_key(text: str, model: str, system_prompt: str, generation_config: Dict) -> str:
+        hasher = hashlib.sha256()
+        for part in (normalize_text(text), model, system_prompt, json.dumps(generation_config, sort_keys=True)):
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\x00')
+        return hasher.hexdigest()
+
+    # Return the cached entry for a key, or None on a miss
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+
+        with metrics.span("cache_lookup"):
+            entry = self._get(key)
+        metrics.increment(f"{self.name}_cache_requests_total", result="hit" if entry is not None else "miss")
+        return entry
+
+    def _get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._is_expired(entry):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._memory.pop(key, None)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._store_memory(key, entry)
+            self.hits += 1
+        return entry
+
+    # Store a finished analysis in both tiers
+    def put(self, key: str, summary: str, terms_looked_up: list):
+        if not self.enabled:
+            return
+
+        entry = {
+            'summary': summary,
+            'terms_looked_up': terms_looked_up,
+            'created_at': time.time(),
+        }
+        with self._lock:
+            self._store_memory(key, entry)
+        self._write_disk(key, entry)
+
+    # Hit/miss counters for telemetry
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'memory_entries': len(self._memory),
+            }
+
+    def _is_expired(self, entry: Dict) -> bool:
+        return time.time() - entry['created_at'] > self.ttl_seconds
+
+    # Insert into the LRU tier, evicting the least recently used entries
+    def _store_memory(self, key: str, entry: Dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self._is_expired(entry):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: Dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            path = self._disk_path(key)
+            is_new = not os.path.exists(path)
+            os.replace(tmp_path, path)
+            if is_new and self._count_disk_entry():
+                self._evict_disk()
+        except Exception as e:
+            print(f"Error writing {self.name} cache: {e}")
+
+    # Count a new disk entry without listing the directory
+    # Only this process's writes are counted between listings, so with several server
+    # processes the count runs low and the limit is enforced late; eviction recounts
+    # Returns: True once the count passes max_disk_entries
+    def _count_disk_entry(self) -> bool:
+        with self._lock:
+            if self._disk_entries is None:
+                self._disk_entries = len(self._list_disk())
+            else:
+                self._disk_entries += 1
+            return self._disk_entries > self.max_disk_entries
+
+    def _list_disk(self) -> list:
+        return [name for name in os.listdir(self.cache_dir) if name.endswith('.json')]
+
+    # Remove expired entries, then the oldest ones down to DISK_EVICT_TARGET of the limit
+    def _evict_disk(self):
+        names = self._list_disk()
+        if len(names) <= self.max_disk_entries:
+            with self._lock:
+                self._disk_entries = len(names)
+            return
+
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+
+        entries.sort()
+        cutoff = time.time() - self.ttl_seconds
+        excess = len(entries) - int(self.max_disk_entries * DISK_EVICT_TARGET)
+        removed = 0
+        for mtime, path in entries:
+            if excess <= 0 and mtime >= cutoff:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            excess -= 1
+        with self._lock:
+            self._disk_entries = len(entries) - removed
+
+analysis_cache = AnalysisCache()
+clause_cache = AnalysisCache("clause", config.CLAUSE_CACHE_DIR)
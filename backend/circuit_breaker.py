@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for each state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Calls were refused because the circuit is open
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Model circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+# Count-based circuit breaker: trips when failed or slow calls make up too much of the
+# last `window` calls, refuses calls while open, then lets a few probe calls through
+# (half-open) and closes again once they succeed
+class CircuitBreaker:
+    def __init__(self, window: int, min_calls: int, failure_rate: float, slow_call_ms: float,
+                 open_seconds: float, half_open_probes: int = 1, on_transition=None):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._on_transition = on_transition
+        self._lock = threading.Lock()
+
+    # Ask to make a call
+    # Raises CircuitOpenError while the circuit is open or every probe slot is taken
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    raise CircuitOpenError(1.0)
+                self._probes += 1
+
+    # Report how a call went; slow successes count against the circuit like failures
+    def record(self, success: bool, latency_ms: Optional[float] = None):
+        bad = not success or (latency_ms is not None and latency_ms >= self.slow_call_ms)
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if bad:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                return
+
+            self._outcomes.append(bad)
+            if len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    # A call that was let through but never made (e.g. cancelled) gives back its probe slot
+    def release(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    # Caller holds self._lock
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        self.state = state
+        self._probes = 0
+        self._probe_successes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+        if self._on_transition is not None:
+            self._on_transition(state)
@@ -0,0 +1,112 @@
+import re
+import textwrap
+from collections import Counter
+
+# Fill-in-the-blank lines with nothing filled in, e.g. "By: ____________", "[_______]" or "______"
+BLANK_FIELD_RE = re.compile(r'^(?:[^:\n]{1,40}:)?[ \t]*[\[(]?[ \t]*_{3,}[ \t]*[\])]?$')
+
+# Page furniture left over from PDF extraction, e.g. "Page 3 of 12" or "- 3 -"
+PAGE_MARKER_RE = re.compile(r'^(?:page[ \t]+\d+(?:[ \t]+of[ \t]+\d+)?|-[ \t]*\d+[ \t]*-)$', re.IGNORECASE)
+
+# The execution clause that introduces the signature block
+WITNESS_RE = re.compile(r'^(?:in witness whereof|signed by the parties|executed as of)\b', re.IGNORECASE)
+
+# A signature block only has short lines: party names, By/Name/Title/Date fields
+SIGNATURE_LINE_MAX_CHARS = 60
+SIGNATURE_BLOCK_MAX_LINES = 40
+
+# Short lines repeated this often at page edges are running headers/footers ("CONFIDENTIAL",
+# the title); a page edge is the first or last few non-blank lines next to a page break
+REPEATED_LINE_MIN_COUNT = 3
+REPEATED_LINE_MAX_CHARS = 80
+PAGE_EDGE_LINES = 2
+
+# Page break between extracted PDF pages (form feed on a line of its own)
+PAGE_BREAK = "\n\f\n"
+
+# Rough token count, ~4 characters per token
+def estimate_text_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+# Prompt template written indented in the source, with the indentation and outer blank lines removed
+def prompt_template(template: str) -> str:
+    return textwrap.dedent(template).strip()
+
+# Shrink a document before it is embedded in a prompt, without changing its wording:
+# - whitespace runs become one space, indentation and trailing spaces go, blank lines collapse
+# - blank fill-in fields and page markers are dropped
+# - running headers/footers are dropped at page edges after their first occurrence; page
+#   breaks are form feeds or page markers, so text without any keeps all its lines
+# - the signature block after the execution clause ("IN WITNESS WHEREOF ...") is dropped
+def compact_document(text: str) -> str:
+    lines, edges = _split_pages(text)
+    lines = _strip_signature_block(lines)
+
+    counts = Counter(
+        line for index, line in enumerate(lines)
+        if index in edges and 0 < len(line) <= REPEATED_LINE_MAX_CHARS
+    )
+    repeated = {line for line, count in counts.items() if count >= REPEATED_LINE_MIN_COUNT}
+
+    kept = []
+    seen_repeated = set()
+    for index, line in enumerate(lines):
+        if BLANK_FIELD_RE.match(line) or PAGE_MARKER_RE.match(line):
+            continue
+        # The same line in the body of a page (e.g. a real heading) is kept
+        if line in repeated and index in edges:
+            if line in seen_repeated:
+                continue
+            seen_repeated.add(line)
+        # Collapse runs of blank lines into one
+        if not line and (not kept or not kept[-1]):
+            continue
+        kept.append(line)
+
+    return '\n'.join(kept).strip()
+
+# Whitespace-normalized lines, and the indices of lines at a page edge
+# Returns: (lines, edges) - edges is empty when the text has no page breaks
+def _split_pages(text: str):
+    lines = []
+    edges = set()
+    page = []
+    breaks = 0
+
+    def end_page():
+        edges.update(page[:PAGE_EDGE_LINES])
+        edges.update(page[-PAGE_EDGE_LINES:])
+        page.clear()
+
+    for number, chunk in enumerate(text.split('\f')):
+        if number:
+            end_page()
+            breaks += 1
+        for line in chunk.splitlines():
+            line = ' '.join(line.split())
+            if PAGE_MARKER_RE.match(line):
+                end_page()
+                breaks += 1
+            elif line:
+                page.append(len(lines))
+            lines.append(line)
+    end_page()
+    return lines, edges if breaks else set()
+
+# Drop the lines after the last execution clause when they look like a signature block
+def _strip_signature_block(lines):
+    for index in range(len(lines) - 1, -1, -1):
+        if WITNESS_RE.match(lines[index]):
+            break
+    else:
+        return lines
+
+    # The execution clause itself may wrap over several lines - keep the whole paragraph
+    end = index + 1
+    while end < len(lines) and lines[end]:
+        end += 1
+
+    block = [line for line in lines[end:] if line]
+    if len(block) > SIGNATURE_BLOCK_MAX_LINES or any(len(line) > SIGNATURE_LINE_MAX_CHARS for line in block):
+        return lines
+    return lines[:end]
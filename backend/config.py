@@ -1,4 +1,6 @@
 import os
+import textwrap
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,6 +10,137 @@ class Config:
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash") 
     LOG_FILE = os.getenv("LOG_FILE", "data/logs.json")
     SUMMARIES_FILE = os.getenv("SUMMARIES_FILE", "data/summaries.json")
+
+    # Telemetry storage: "ndjson" (append-only, background writer) or "json" (legacy arrays)
+    TELEMETRY_STORAGE = os.getenv("TELEMETRY_STORAGE", "ndjson")
+    TELEMETRY_QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000"))
+    TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "0.5"))
+    TELEMETRY_FSYNC_INTERVAL = float(os.getenv("TELEMETRY_FSYNC_INTERVAL", "5"))
+
+    # Summary storage: "sqlite" (indexed, paginated) or "file" (uses TELEMETRY_STORAGE)
+    SUMMARY_STORAGE = os.getenv("SUMMARY_STORAGE", "sqlite")
+    SUMMARIES_DB = os.getenv("SUMMARIES_DB", "data/summaries.db")
+
+    # Server processes (set by `run.py --prod`); the Gemini quota below is split between them
+    WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    # Identifies one server run, shared by all of its worker processes
+    BOOT_ID = os.getenv("APP_BOOT_ID") or uuid.uuid4().hex
+    # Seconds in-flight requests and batch documents get to finish on shutdown
+    SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+
+    # Maximum number of Gemini calls allowed in flight at once
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+    # Gemini quota for the model in use (requests and tokens per minute)
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", "10"))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+    # Retries for 429 and 5xx responses (jittered exponential backoff)
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "30"))
+    # Give up on a call (and retry it) after this many seconds without a response
+    GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "120"))
+
+    # Circuit breaker: when failed or slow calls reach CIRCUIT_BREAKER_FAILURE_RATE of the
+    # last CIRCUIT_BREAKER_WINDOW calls, model calls fail fast for CIRCUIT_BREAKER_OPEN_SECONDS
+    # (interactive requests get the fallback summary, batch documents wait), then one probe
+    # call decides whether to close again
+    CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+    CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", "20"))
+    CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "10"))
+    CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+    CIRCUIT_BREAKER_SLOW_CALL_MS = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_MS", "60000"))
+    CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+
+    # Hedged requests: if a call hasn't answered after the recent p95 latency (at least
+    # GEMINI_HEDGE_MIN_DELAY_MS), send a second copy and use whichever answers first
+    # Costs extra quota for the slowest calls; streaming calls are never hedged
+    GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+    GEMINI_HEDGE_QUANTILE = float(os.getenv("GEMINI_HEDGE_QUANTILE", "0.95"))
+    GEMINI_HEDGE_MIN_DELAY_MS = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "2000"))
+
+    # File uploads
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "10"))
+
+    # Batch jobs
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "1000"))
+    BATCHES_DB = os.getenv("BATCHES_DB", "data/batches.db")
+    # A running document whose worker hasn't checked in for this long is assumed to belong
+    # to a dead worker process and is handed to another worker
+    BATCH_CLAIM_TIMEOUT_SECONDS = float(os.getenv("BATCH_CLAIM_TIMEOUT_SECONDS", "120"))
+
+    # Input limits and long-document (map-reduce) mode
+    MAX_INPUT_CHARS = int(os.getenv("MAX_INPUT_CHARS", "500000"))
+    LONG_DOCUMENT_THRESHOLD = int(os.getenv("LONG_DOCUMENT_THRESHOLD", "30000"))
+    LONG_DOCUMENT_CHUNK_CHARS = int(os.getenv("LONG_DOCUMENT_CHUNK_CHARS", "12000"))
+    LONG_DOCUMENT_MAP_CONCURRENCY = int(os.getenv("LONG_DOCUMENT_MAP_CONCURRENCY", "8"))
+
+    # Analysis mode: "document" (one prompt per document) or "clause" (one prompt per
+    # numbered clause, cached per clause so a revision only re-sends the edited clauses)
+    ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "document")
+    CLAUSE_MIN_CHARS = int(os.getenv("CLAUSE_MIN_CHARS", "200"))
+    CLAUSE_MAX_CHARS = int(os.getenv("CLAUSE_MAX_CHARS", "6000"))
+
+    # Model routing: short, simple documents go to a faster, cheaper model tier; documents
+    # over any light-tier limit (estimated tokens after compaction, numbered sections,
+    # glossary terms per 100 words) and
+    # every long or clause-mode analysis use GEMINI_MODEL
+    MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+    GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
+    GEMINI_LIGHT_MODEL = os.getenv("GEMINI_LIGHT_MODEL", "gemini-2.5-flash-lite")
+    GEMINI_LIGHT_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_LIGHT_MAX_OUTPUT_TOKENS", "1024"))
+    ROUTING_LIGHT_MAX_TOKENS = int(os.getenv("ROUTING_LIGHT_MAX_TOKENS", "750"))
+    ROUTING_LIGHT_MAX_SECTIONS = int(os.getenv("ROUTING_LIGHT_MAX_SECTIONS", "5"))
+    ROUTING_LIGHT_MAX_TERM_DENSITY = float(os.getenv("ROUTING_LIGHT_MAX_TERM_DENSITY", "4.0"))
+
+    # Compact documents before they are embedded in a prompt (whitespace, blank fill-in
+    # fields, page markers, repeated headers and the signature block are dropped)
+    PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() == "true"
+
+    # Analysis result cache
+    ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+    ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "data/cache/analysis")
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256"))
+    ANALYSIS_CACHE_MAX_DISK_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_DISK_ENTRIES", "5000"))
+    ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    # Per-clause analyses (clause mode) are cached separately, with their own hit/miss counts
+    CLAUSE_CACHE_DIR = os.getenv("CLAUSE_CACHE_DIR", "data/cache/clauses")
+
+    # Near-duplicate detection against earlier analyses (similarity = word 5-gram overlap)
+    # At the reuse threshold the earlier summary is returned as is (1.0: only case/punctuation
+    # differences); at the diff threshold Gemini updates the earlier summary from a diff
+    SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() == "true"
+    SIMILARITY_INDEX_FILE = os.getenv("SIMILARITY_INDEX_FILE", "data/similarity_index.ndjson")
+    SIMILARITY_REUSE_THRESHOLD = float(os.getenv("SIMILARITY_REUSE_THRESHOLD", "1.0"))
+    SIMILARITY_DIFF_THRESHOLD = float(os.getenv("SIMILARITY_DIFF_THRESHOLD", "0.6"))
+    SIMILARITY_MAX_DIFF_CHARS = int(os.getenv("SIMILARITY_MAX_DIFF_CHARS", "8000"))
+    SIMILARITY_BANDS = int(os.getenv("SIMILARITY_BANDS", "32"))
+    SIMILARITY_ROWS = int(os.getenv("SIMILARITY_ROWS", "4"))
+    # Earlier documents are forgotten after the TTL, and only the newest MAX_ENTRIES are kept
+    SIMILARITY_TTL_SECONDS = int(os.getenv("SIMILARITY_TTL_SECONDS", str(7 * 24 * 3600)))
+    SIMILARITY_MAX_ENTRIES = int(os.getenv("SIMILARITY_MAX_ENTRIES", "5000"))
+
+    # Legal term definition cache - appended to the .ndjson file next to this path (an existing
+    # JSON cache at this path is imported once)
+    DEFINITION_CACHE_FILE = os.getenv("DEFINITION_CACHE_FILE", "data/cache/definitions.json")
+    DEFINITION_CACHE_TTL_SECONDS = int(os.getenv("DEFINITION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    DEFINITION_NEGATIVE_TTL_SECONDS = int(os.getenv("DEFINITION_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+
+    # Offline legal glossary, with the dictionary API as an optional fallback
+    GLOSSARY_FILE = os.getenv("GLOSSARY_FILE", "data/legal_glossary.json")
+    DEFINITION_REMOTE_FALLBACK = os.getenv("DEFINITION_REMOTE_FALLBACK", "true").lower() == "true"
+    # Definitions added per summary; terms are looked up concurrently over pooled keep-alive
+    # connections and whatever has not answered by the deadline (seconds) is dropped
+    DEFINITION_LOOKUP_LIMIT = int(os.getenv("DEFINITION_LOOKUP_LIMIT", "3"))
+    DEFINITION_LOOKUP_CONCURRENCY = int(os.getenv("DEFINITION_LOOKUP_CONCURRENCY", "8"))
+    DEFINITION_LOOKUP_DEADLINE = float(os.getenv("DEFINITION_LOOKUP_DEADLINE", "5"))
+    # Start looking up terms found in the document text while the model call is running
+    TERM_PREFETCH_ENABLED = os.getenv("TERM_PREFETCH_ENABLED", "true").lower() == "true"
+    TERM_PREFETCH_MAX_TERMS = int(os.getenv("TERM_PREFETCH_MAX_TERMS", "20"))
+    DICTIONARY_API_URL = os.getenv("DICTIONARY_API_URL", "https://api.dictionaryapi.dev/api/v2/entries/en")
     
     # Safety settings
     INJECTION_PATTERNS = [
@@ -65,8 +198,8 @@ class Config:
     "clear context",
 ]
     
-    # System prompt with explicit rules
-    SYSTEM_PROMPT = """
+    # System prompt with explicit rules (dedented so the indentation isn't sent with every call)
+    SYSTEM_PROMPT = textwrap.dedent("""
         You are a legal document analysis assistant. Your role is to:
 
         DO:
@@ -84,6 +217,6 @@ class Config:
         - Process non-legal or inappropriate content
 
         If you encounter a legal term that may be unclear, automatically use the legal_term_lookup tool to provide a definition.
-        """
+        """).strip()
 
 config = Config()
\ No newline at end of file
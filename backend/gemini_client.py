@@ -1,105 +1,717 @@
-import google.generativeai as genai
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, AsyncIterator
+import asyncio
+import difflib
 import re
+import threading
 from .config import config
-from .tools import legal_term_lookup
+from .tools import legal_term_lookup, TermPrefetch
+from .cache import analysis_cache, clause_cache
+from .sections import chunk_text, split_clauses
+from .similarity import similarity_index
+from .metrics import metrics
+from .scheduler import gemini_scheduler, estimate_tokens, ModelBusyError
+from .routing import model_router, ModelRoute, STANDARD
+from .compaction import compact_document, estimate_text_tokens, prompt_template
 
-# Configure Gemini
-genai.configure(api_key=config.GEMINI_API_KEY)
+# Configure generation settings
+GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'top_p': 0.95,
+    'top_k': 40,
+    'max_output_tokens': config.GEMINI_MAX_OUTPUT_TOKENS,
+}
+
+# Safety settings - set to BLOCK_NONE for legal documents
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+# Prompt templates, written indented here and dedented once at import so the
+# indentation isn't sent (and charged) with every call
+ANSWER_FORMAT = """
+    Format your response EXACTLY like this:
+
+    Document Type: [type]
+
+    Summary:
+    [Your detailed summary here]
+
+    Legal Terms Found:
+    - term1: definition1
+    - term2: definition2
+    - term3: definition3
+"""
+
+ANALYSIS_CHECKLIST = """
+    Provide:
+    1. Document type (e.g., NDA, Employment Agreement, etc.)
+    2. Key parties involved
+    3. Important dates and terms
+    4. Main obligations and rights
+    5. Notable clauses or risks
+    6. **List any specialized legal terms or jargon that appear in the document** (e.g., indemnification, force majeure, arbitration, etc.)
+"""
+
+ANALYSIS_PROMPT = "\n\n".join([
+    "Analyze this legal document and provide a clear, structured summary.",
+    "Document:\n{text}",
+    prompt_template(ANALYSIS_CHECKLIST),
+    prompt_template(ANSWER_FORMAT),
+])
+
+DIFF_PROMPT = "\n\n".join([
+    "This legal document is a revised version of one that was already analyzed.",
+    "Analysis of the previous version:\n{previous_summary}",
+    'Changes from the previous version (unified diff, "-" lines removed, "+" lines added):\n{diff}',
+    prompt_template("""
+        Update the analysis so it accurately describes the revised document: parties,
+        dates, amounts, obligations, clauses and legal terms. Do not mention that the
+        document was revised.
+    """),
+    prompt_template(ANSWER_FORMAT),
+])
+
+CLAUSE_PROMPT = "\n\n".join([
+    "{intro}\nAnalyze this clause only.",
+    "Clause:\n{clause}",
+    prompt_template("""
+        Format your response EXACTLY like this:
+
+        {header}Clause Summary: [1-3 sentences on the obligations, rights, dates, amounts and risks in this clause]
+
+        Legal Terms Found:
+        - term1: definition1
+        - term2: definition2
+
+        Leave the Legal Terms Found list empty if the clause has no specialized legal terms.
+    """),
+])
+
+CHUNK_PROMPT = "\n\n".join([
+    prompt_template("""
+        This is part {part} of {total_parts} of a longer legal document.
+        Summarize this part only. Note any parties, dates, obligations, rights,
+        notable clauses or risks, and list specialized legal terms that appear in it.
+    """),
+    "Document part {part}:\n{chunk}",
+])
+
+REDUCE_PROMPT = "\n\n".join([
+    prompt_template("""
+        The following are summaries of consecutive parts of one legal document.
+        Merge them into a single clear, structured summary of the whole document.
+    """),
+    "{parts}",
+    prompt_template(ANALYSIS_CHECKLIST),
+    prompt_template(ANSWER_FORMAT),
+])
 
 # Handles interaction with Gemini API including tool calling
 class GeminiClient:
     def __init__(self):
-        self.model = genai.GenerativeModel(
-            config.GEMINI_MODEL, 
-            system_instruction=config.SYSTEM_PROMPT
-        )
+        self._model = None
+        self._models: Dict[str, object] = {}
+        self._model_lock = threading.Lock()
         self.terms_looked_up = []
-    
+        # Analyses currently running, by cache key - identical documents share one
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    # The standard-tier Gemini model, created on first use so importing the client doesn't
+    # load the SDK (assign a stand-in here to run every tier without the API, e.g. in benchmarks)
+    @property
+    def model(self):
+        return self._model_for(config.GEMINI_MODEL)
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    # The Gemini model with the given name, created on first use
+    def _model_for(self, name: str):
+        if self._model is not None:
+            return self._model
+        model = self._models.get(name)
+        if model is None:
+            with self._model_lock:
+                model = self._models.get(name)
+                if model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=config.GEMINI_API_KEY)
+                    model = self._models[name] = genai.GenerativeModel(
+                        name,
+                        system_instruction=config.SYSTEM_PROMPT
+                    )
+        return model
+
     # Analyze a legal document using Gemini
     # Returns: (summary, terms_looked_up, usage_metadata)
     def analyze_document(self, text: str) -> Tuple[str, List[str], Dict]:
-        self.terms_looked_up = []
-        
-        # Create the prompt
-        prompt = f"""
-            Analyze this legal document and provide a clear, structured summary.
-
-            Document:
-            {text}
-
-            Provide:
-            1. Document type (e.g., NDA, Employment Agreement, etc.)
-            2. Key parties involved
-            3. Important dates and terms
-            4. Main obligations and rights
-            5. Notable clauses or risks
-            6. **List any specialized legal terms or jargon that appear in the document** (e.g., indemnification, force majeure, arbitration, etc.)
-
-            Format your response EXACTLY like this:
-
-            Document Type: [type]
-            
-            Summary:
-            [Your detailed summary here]
-            
-            Legal Terms Found:
-            - term1: definition1
-            - term2: definition2
-            - term3: definition3
-        """
+        document = self._compact(text)
+        route = model_router.route(document)
+        cache_key = self._cache_key(text, route=route)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return self._cached_response(cached)
+
+        prompt = self._build_prompt(document)
 
-        # Configure generation settings
-        generation_config = {
-            'temperature': 0.7,
-            'top_p': 0.95,
-            'top_k': 40,
-            'max_output_tokens': 2048,
-        }
-        
-        # Safety settings - set to BLOCK_NONE for legal documents
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
         try:
             # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
+            parsed = self._generate_sync(prompt, route)
+
             # Check if response was blocked - use fallback
-            if not response.parts:
-                return self._get_fallback_response(text)
-            
-            summary = response.text
-            
+            if parsed is None:
+                return self._get_fallback_response(text, route)
+            summary, usage_metadata = parsed
+            usage_metadata['model_tier'] = route.tier
+            usage_metadata['prompt_tokens_saved'] = self._tokens_saved(text, document)
+
             # Extract legal terms that Gemini identified
             ai_identified_terms = self._extract_terms_from_summary(summary)
-            
+
             # Enhance with definitions for the terms Gemini found
-            summary_with_definitions = self._enhance_with_definitions(summary, ai_identified_terms)
-            
-            # Get usage metadata
-            usage_metadata = {
-                'prompt_tokens': response.usage_metadata.prompt_token_count,
-                'completion_tokens': response.usage_metadata.candidates_token_count,
-                'total_tokens': response.usage_metadata.total_token_count,
-            }
-            
-            return summary_with_definitions, self.terms_looked_up, usage_metadata
-            
+            summary_with_definitions, terms_looked_up = self._enhance_with_definitions(summary, ai_identified_terms)
+            self.terms_looked_up = terms_looked_up
+
+            analysis_cache.put(cache_key, summary_with_definitions, terms_looked_up)
+            return summary_with_definitions, terms_looked_up, usage_metadata
+
+        except ModelBusyError:
+            # Out of quota even after retrying - the caller should ask the user to wait
+            raise
         except Exception:
             # Handle any API errors with fallback
-            return self._get_fallback_response(text)
-    
+            return self._get_fallback_response(text, route)
+
+    # Async version of analyze_document for use inside the event loop
+    # Returns: (summary, terms_looked_up, usage_metadata)
+    # mode: "document" or "clause" (defaults to ANALYSIS_MODE)
+    async def analyze_document_async(self, text: str, mode: Optional[str] = None) -> Tuple[str, List[str], Dict]:
+        mode = mode or config.ANALYSIS_MODE
+        document = self._compact(text)
+        route = self._route(document, mode)
+        cache_key = self._cache_key(text, mode, route)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return self._cached_response(cached)
+
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            return await self._join_in_flight(in_flight)
+
+        # Run the analysis as its own task so a caller going away doesn't cancel it for the others
+        task = asyncio.ensure_future(self._analyze_uncached(text, document, cache_key, mode, route))
+        self._in_flight[cache_key] = task
+        task.add_done_callback(lambda done: self._finish_in_flight(cache_key, done))
+        return await asyncio.shield(task)
+
+    # Wait for an identical analysis that is already running and share its result
+    # Returns: (summary, terms_looked_up, usage_metadata) - no tokens are charged to this caller
+    async def _join_in_flight(self, task: asyncio.Task) -> Tuple[str, List[str], Dict]:
+        with metrics.span("coalesced_wait"):
+            summary, terms_looked_up, _ = await asyncio.shield(task)
+        metrics.increment("coalesced_requests_total")
+        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'coalesced': True}
+        return summary, list(terms_looked_up), usage_metadata
+
+    def _finish_in_flight(self, cache_key: str, task: asyncio.Task):
+        if self._in_flight.get(cache_key) is task:
+            del self._in_flight[cache_key]
+        # Mark the exception as seen - every waiter may have been cancelled
+        if not task.cancelled():
+            task.exception()
+
+    # text is the document as submitted, document its compacted form that goes into prompts
+    async def _analyze_uncached(self, text: str, document: str, cache_key: str, mode: str,
+                                route: ModelRoute) -> Tuple[str, List[str], Dict]:
+        prefetch = self._start_prefetch(text)
+        try:
+            near_duplicate = None
+            if mode == 'clause':
+                parsed = await self._analyze_clauses_async(document)
+            else:
+                # A near-duplicate of an earlier document reuses or updates that analysis
+                near_duplicate = await asyncio.to_thread(self._find_near_duplicate, text, document, route)
+                if near_duplicate is None:
+                    parsed = await self._analyze_full_async(document, route)
+                elif near_duplicate['mode'] == 'reuse':
+                    parsed = near_duplicate['summary'], {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+                else:
+                    parsed = await self._generate_async(near_duplicate['prompt'], route)
+
+            if parsed is None:
+                return self._get_fallback_response(text, route)
+            summary, usage_metadata = parsed
+            if near_duplicate is None or near_duplicate['mode'] == 'diff':
+                usage_metadata['model_tier'] = route.tier
+            if near_duplicate is None:
+                usage_metadata['prompt_tokens_saved'] = self._tokens_saved(text, document)
+
+            if near_duplicate is not None:
+                usage_metadata['near_duplicate'] = near_duplicate['mode']
+                usage_metadata['similarity'] = near_duplicate['similarity']
+            if mode != 'clause' and (near_duplicate is None or near_duplicate['mode'] == 'diff'):
+                await asyncio.to_thread(similarity_index.add, cache_key, text, self._similarity_scope(route), summary)
+
+            ai_identified_terms = self._extract_terms_from_summary(summary)
+            summary_with_definitions, terms_looked_up = await self._enhance_with_definitions_async(
+                summary, ai_identified_terms, prefetch
+            )
+
+            analysis_cache.put(cache_key, summary_with_definitions, terms_looked_up)
+            return summary_with_definitions, terms_looked_up, usage_metadata
+
+        except ModelBusyError:
+            raise
+        except Exception:
+            return self._get_fallback_response(text, route)
+        finally:
+            if prefetch is not None:
+                prefetch.close()
+
+    # Whole-document analysis - long documents are summarized in parallel chunks and merged
+    # Returns: (summary, usage_metadata), or None if the response was blocked
+    async def _analyze_full_async(self, text: str, route: ModelRoute) -> Optional[Tuple[str, Dict]]:
+        if len(text) > config.LONG_DOCUMENT_THRESHOLD:
+            return await self._map_reduce_async(text)
+        return await self._generate_async(self._build_prompt(text), route)
+
+    # Analyze each clause on its own, reusing cached results for clauses that haven't changed,
+    # so re-analyzing a revised document only sends the edited clauses to Gemini
+    # Returns: (summary, usage_metadata), or None if no clause could be analyzed
+    async def _analyze_clauses_async(self, text: str) -> Optional[Tuple[str, Dict]]:
+        clauses = split_clauses(text, config.CLAUSE_MIN_CHARS, config.CLAUSE_MAX_CHARS)
+        limit = asyncio.Semaphore(config.LONG_DOCUMENT_MAP_CONCURRENCY)
+
+        async def analyze_clause(index: int, clause: str):
+            opening = index == 0
+            key = self._clause_cache_key(clause, opening)
+            cached = clause_cache.get(key)
+            if cached is not None:
+                return cached['summary'], None
+            async with limit:
+                result = await self._generate_async(self._build_clause_prompt(clause, opening))
+            if result is not None:
+                clause_cache.put(key, result[0], [])
+            return result
+
+        results = await asyncio.gather(*(analyze_clause(i, clause) for i, (_, clause) in enumerate(clauses)))
+        if all(result is None for result in results):
+            return None
+
+        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        analyses = []
+        reused = 0
+        for (heading, _), result in zip(clauses, results):
+            if result is None:
+                analyses.append((heading, None))
+                continue
+            if result[1] is None:
+                reused += 1
+            else:
+                self._add_usage(usage_metadata, result[1])
+            analyses.append((heading, result[0]))
+
+        usage_metadata['clauses'] = len(clauses)
+        usage_metadata['clauses_reused'] = reused
+        return self._stitch_clause_analyses(analyses), usage_metadata
+
+    # Per-clause cache key - the opening clause is prompted differently (document type, parties)
+    def _clause_cache_key(self, clause: str, opening: bool) -> str:
+        clause_config = dict(GENERATION_CONFIG, analysis_mode='clause', opening=opening)
+        return clause_cache.make_key(clause, config.GEMINI_MODEL, config.SYSTEM_PROMPT, clause_config)
+
+    # Combine clause analyses into the standard Document Type / Summary / Legal Terms Found format
+    def _stitch_clause_analyses(self, analyses: List[Tuple[str, Optional[str]]]) -> str:
+        document_type = "Legal Document"
+        parties = None
+        summary_lines = []
+        terms = {}
+
+        for index, (heading, analysis) in enumerate(analyses):
+            label = heading or ("Preamble" if index == 0 else f"Part {index + 1}")
+            if analysis is None:
+                summary_lines.append(f"- **{label}**: [This clause could not be analyzed]")
+                continue
+
+            if index == 0:
+                match = re.search(r'Document Type:\s*(.+)', analysis)
+                if match:
+                    document_type = match.group(1).strip()
+                match = re.search(r'Parties:\s*(.+)', analysis)
+                if match:
+                    parties = match.group(1).strip()
+
+            match = re.search(r'Clause Summary:\s*(.*?)(?:\n\s*Legal Terms Found:|$)', analysis, re.DOTALL)
+            clause_summary = (match.group(1) if match else analysis).strip()
+            summary_lines.append(f"- **{label}**: {' '.join(clause_summary.split())}")
+
+            if "Legal Terms Found:" in analysis:
+                for line in analysis.split("Legal Terms Found:", 1)[1].splitlines():
+                    line = line.strip()
+                    if line[:1] in ('-', '*', '•'):
+                        term = line.lstrip('-*• ').split(':', 1)[0].strip().lower()
+                        if term and term not in terms:
+                            terms[term] = line.lstrip('-*• ')
+
+        summary = f"Document Type: {document_type}\n\nSummary:\n"
+        if parties:
+            summary += f"Parties: {parties}\n\n"
+        summary += "\n".join(summary_lines)
+        summary += "\n\nLegal Terms Found:\n" + "\n".join(f"- {entry}" for entry in terms.values())
+        return summary
+
+    # Stream an analysis as it is generated
+    # Yields {'type': 'chunk', 'text'} events as tokens arrive, then a 'terms' event with the
+    # definitions section, then a final 'done' event with the full summary and usage metadata
+    async def analyze_document_stream(self, text: str, mode: Optional[str] = None) -> AsyncIterator[Dict]:
+        mode = mode or config.ANALYSIS_MODE
+        document = self._compact(text)
+        # Long documents (map-reduce) and clause-level analyses arrive in one piece
+        if mode == 'clause' or len(document) > config.LONG_DOCUMENT_THRESHOLD:
+            for event in self._whole_response_events(*await self.analyze_document_async(text, mode)):
+                yield event
+            return
+
+        route = self._route(document, mode)
+        cache_key = self._cache_key(text, mode, route)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            for event in self._whole_response_events(*self._cached_response(cached)):
+                yield event
+            return
+
+        # The same document is already being analyzed - send its result in one piece
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            for event in self._whole_response_events(*await self._join_in_flight(in_flight)):
+                yield event
+            return
+
+        # Run the analysis as its own task, registered like analyze_document_async's, so identical
+        # requests arriving meanwhile (streamed or not) share it and a disconnect doesn't cancel it
+        events: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(self._stream_uncached(text, document, cache_key, route, events))
+        self._in_flight[cache_key] = task
+        task.add_done_callback(lambda done: self._finish_in_flight(cache_key, done))
+
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        # Re-raise the error if the analysis failed
+        await asyncio.shield(task)
+
+    # Stream an uncached analysis into events (None marks the end)
+    # Returns: (summary, terms_looked_up, usage_metadata) for requests that joined it
+    async def _stream_uncached(self, text: str, document: str, cache_key: str, route: ModelRoute,
+                               events: asyncio.Queue) -> Tuple[str, List[str], Dict]:
+        try:
+            near_duplicate = await asyncio.to_thread(self._find_near_duplicate, text, document, route)
+            if near_duplicate is not None and near_duplicate['mode'] == 'reuse':
+                result = await self._analyze_uncached(text, document, cache_key, 'document', route)
+                for event in self._whole_response_events(*result):
+                    events.put_nowait(event)
+                return result
+
+            prompt = near_duplicate['prompt'] if near_duplicate is not None else self._build_prompt(document)
+            prefetch = self._start_prefetch(text)
+            try:
+                result = None
+                async for event in self._stream_model(text, document, cache_key, prompt, route, near_duplicate, prefetch):
+                    events.put_nowait(event)
+                    if event['type'] == 'done':
+                        result = event['summary'], event['terms_looked_up'], event['usage_metadata']
+                return result
+            finally:
+                if prefetch is not None:
+                    prefetch.close()
+        finally:
+            events.put_nowait(None)
+
+    # Stream the model's answer for prompt, then add definitions and cache the result
+    # Streamed output can't be retried on another tier, so a light-tier stream is not escalated
+    async def _stream_model(self, text: str, document: str, cache_key: str, prompt: str, route: ModelRoute,
+                            near_duplicate: Optional[Dict], prefetch: Optional[TermPrefetch]) -> AsyncIterator[Dict]:
+        parts = []
+        last_chunk = None
+
+        try:
+            with metrics.span("gemini_call"):
+                # The scheduler slot is held until the stream has been read
+                async with gemini_scheduler.request(
+                    lambda: self._model_for(route.model).generate_content_async(
+                        prompt,
+                        generation_config=self._generation_config(route),
+                        safety_settings=SAFETY_SETTINGS,
+                        stream=True
+                    ),
+                    self._estimate_tokens(prompt, route.max_output_tokens)
+                ) as response:
+                    async for chunk in response:
+                        last_chunk = chunk
+                        if not chunk.parts:
+                            continue
+                        parts.append(chunk.text)
+                        yield {'type': 'chunk', 'text': chunk.text}
+        except ModelBusyError:
+            raise
+        except Exception:
+            # Errors after partial output can't be hidden behind the fallback
+            if parts:
+                raise
+
+        # Blocked or failed before any output - send the fallback instead
+        if not parts:
+            for event in self._whole_response_events(*self._get_fallback_response(text, route)):
+                yield event
+            return
+
+        summary = ''.join(parts)
+        usage_metadata = {
+            'prompt_tokens': last_chunk.usage_metadata.prompt_token_count,
+            'completion_tokens': last_chunk.usage_metadata.candidates_token_count,
+            'total_tokens': last_chunk.usage_metadata.total_token_count,
+            'model_tier': route.tier,
+        }
+        if near_duplicate is not None:
+            usage_metadata['near_duplicate'] = near_duplicate['mode']
+            usage_metadata['similarity'] = near_duplicate['similarity']
+        else:
+            usage_metadata['prompt_tokens_saved'] = self._tokens_saved(text, document)
+        await asyncio.to_thread(similarity_index.add, cache_key, text, self._similarity_scope(route), summary)
+
+        ai_identified_terms = self._extract_terms_from_summary(summary)
+        summary_with_definitions, terms_looked_up = await self._enhance_with_definitions_async(
+            summary, ai_identified_terms, prefetch
+        )
+        if terms_looked_up:
+            yield {'type': 'terms', 'text': summary_with_definitions[len(summary):], 'terms_looked_up': terms_looked_up}
+
+        analysis_cache.put(cache_key, summary_with_definitions, terms_looked_up)
+        yield {'type': 'done', 'summary': summary_with_definitions, 'terms_looked_up': terms_looked_up, 'usage_metadata': usage_metadata}
+
+    # Run one model call through the outbound scheduler (quota, priority, retries)
+    # A light-tier answer that was blocked or cut off at its output budget is retried on the
+    # standard tier (usage then covers both calls and has 'escalated' set)
+    # Returns: (text, usage_metadata), or None if the response was blocked
+    async def _generate_async(self, prompt: str, route: Optional[ModelRoute] = None) -> Optional[Tuple[str, Dict]]:
+        route = route or model_router.standard
+        with metrics.span("gemini_call"):
+            response = await gemini_scheduler.run(
+                lambda: self._model_for(route.model).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(route),
+                    safety_settings=SAFETY_SETTINGS
+                ),
+                self._estimate_tokens(prompt, route.max_output_tokens)
+            )
+        parsed = self._parse_response(response)
+        if not self._should_escalate(route, response, parsed):
+            return parsed
+        return self._escalated(parsed, await self._generate_async(prompt))
+
+    # Blocking version of _generate_async for analyze_document
+    def _generate_sync(self, prompt: str, route: ModelRoute) -> Optional[Tuple[str, Dict]]:
+        with metrics.span("gemini_call"):
+            response = gemini_scheduler.run_sync(
+                lambda: self._model_for(route.model).generate_content(
+                    prompt,
+                    generation_config=self._generation_config(route),
+                    safety_settings=SAFETY_SETTINGS
+                ),
+                self._estimate_tokens(prompt, route.max_output_tokens)
+            )
+        parsed = self._parse_response(response)
+        if not self._should_escalate(route, response, parsed):
+            return parsed
+        return self._escalated(parsed, self._generate_sync(prompt, model_router.standard))
+
+    def _should_escalate(self, route: ModelRoute, response, parsed: Optional[Tuple[str, Dict]]) -> bool:
+        if route.tier == STANDARD:
+            return False
+        if parsed is None:
+            reason = "blocked"
+        elif self._truncated(response):
+            reason = "truncated"
+        else:
+            return False
+        metrics.increment("model_route_escalations_total", tier=route.tier, reason=reason)
+        return True
+
+    # Combine the usage of a light-tier attempt with its standard-tier retry
+    def _escalated(self, attempt: Optional[Tuple[str, Dict]],
+                   retry: Optional[Tuple[str, Dict]]) -> Optional[Tuple[str, Dict]]:
+        if retry is None:
+            return None
+        if attempt is not None:
+            self._add_usage(retry[1], attempt[1])
+        retry[1]['escalated'] = True
+        return retry
+
+    # The model stopped because it reached max_output_tokens
+    @staticmethod
+    def _truncated(response) -> bool:
+        candidates = getattr(response, 'candidates', None) or []
+        return bool(candidates) and getattr(candidates[0].finish_reason, 'name', None) == 'MAX_TOKENS'
+
+    # The document as it is embedded in prompts
+    def _compact(self, text: str) -> str:
+        if not config.PROMPT_COMPACTION_ENABLED:
+            return text
+        with metrics.span("prompt_compaction"):
+            return compact_document(text)
+
+    # Estimated prompt tokens compaction saved on a document
+    @staticmethod
+    def _tokens_saved(text: str, document: str) -> int:
+        return estimate_text_tokens(text) - estimate_text_tokens(document)
+
+    # Route for an analysis - clause-mode prompts are always sent to the standard tier
+    def _route(self, text: str, mode: str) -> ModelRoute:
+        return model_router.route(text) if mode == 'document' else model_router.standard
+
+    @staticmethod
+    def _generation_config(route: ModelRoute) -> Dict:
+        return dict(GENERATION_CONFIG, max_output_tokens=route.max_output_tokens)
+
+    # Tokens a call is expected to use, charged against the TPM quota before sending
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_output_tokens: int = GENERATION_CONFIG['max_output_tokens']) -> int:
+        return estimate_tokens(prompt, max_output_tokens)
+
+    # Summarize section-aligned chunks concurrently, then merge them in a reduce pass
+    # Returns: (summary, usage_metadata), or None if nothing could be summarized
+    async def _map_reduce_async(self, text: str) -> Optional[Tuple[str, Dict]]:
+        chunks = chunk_text(text, config.LONG_DOCUMENT_CHUNK_CHARS)
+        limit = asyncio.Semaphore(config.LONG_DOCUMENT_MAP_CONCURRENCY)
+
+        async def summarize_chunk(index: int, chunk: str):
+            async with limit:
+                return await self._generate_async(self._build_chunk_prompt(chunk, index + 1, len(chunks)))
+
+        results = await asyncio.gather(*(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        partial_summaries = []
+        for index, result in enumerate(results):
+            if result is None:
+                partial_summaries.append(f"[Part {index + 1} could not be summarized]")
+                continue
+            partial_summaries.append(result[0])
+            self._add_usage(usage_metadata, result[1])
+
+        if all(result is None for result in results):
+            return None
+
+        reduced = await self._generate_async(self._build_reduce_prompt(partial_summaries))
+        if reduced is None:
+            return None
+        self._add_usage(usage_metadata, reduced[1])
+        usage_metadata['chunks'] = len(chunks)
+        return reduced[0], usage_metadata
+
+    @staticmethod
+    def _add_usage(total: Dict, usage: Dict):
+        for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+            total[key] += usage.get(key) or 0
+
+    # Stream events for a result that is already complete (cache hit or fallback)
+    def _whole_response_events(self, summary: str, terms_looked_up: List[str], usage_metadata: Dict) -> List[Dict]:
+        return [
+            {'type': 'chunk', 'text': summary},
+            {'type': 'done', 'summary': summary, 'terms_looked_up': terms_looked_up, 'usage_metadata': usage_metadata},
+        ]
+
+    # Cache key covering the document and everything that shapes the model output
+    def _cache_key(self, text: str, mode: str = 'document', route: Optional[ModelRoute] = None) -> str:
+        if mode != 'document':
+            generation_config = dict(GENERATION_CONFIG, analysis_mode=mode)
+            return analysis_cache.make_key(text, config.GEMINI_MODEL, config.SYSTEM_PROMPT, generation_config)
+        route = route or model_router.standard
+        return analysis_cache.make_key(text, route.model, config.SYSTEM_PROMPT, self._generation_config(route))
+
+    # Near-duplicates are only matched against analyses made with the same model tier and prompts
+    def _similarity_scope(self, route: ModelRoute) -> str:
+        return analysis_cache.make_key("", route.model, config.SYSTEM_PROMPT, self._generation_config(route))
+
+    # Look for an earlier analysis of a near-identical document
+    # Returns: {'mode': 'reuse', 'summary', 'similarity'} when it can be returned as is,
+    # {'mode': 'diff', 'prompt', 'similarity'} when Gemini should update it from a diff, or None
+    def _find_near_duplicate(self, text: str, document: str, route: ModelRoute) -> Optional[Dict]:
+        match = similarity_index.query(text, self._similarity_scope(route), config.SIMILARITY_DIFF_THRESHOLD)
+        if match is None:
+            return None
+        record, similarity = match
+
+        if similarity >= config.SIMILARITY_REUSE_THRESHOLD:
+            metrics.increment("near_duplicates_total", mode="reuse")
+            return {'mode': 'reuse', 'summary': record['summary'], 'similarity': similarity}
+
+        prompt = self._build_diff_prompt(record['summary'], self._compact(record['text']), document)
+        if prompt is None:
+            return None
+        metrics.increment("near_duplicates_total", mode="diff")
+        return {'mode': 'diff', 'prompt': prompt, 'similarity': similarity}
+
+    # Build the return value for a cache hit - no tokens were spent
+    def _cached_response(self, cached: Dict) -> Tuple[str, List[str], Dict]:
+        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cache_hit': True}
+        return cached['summary'], list(cached['terms_looked_up']), usage_metadata
+
+    # Create the prompt
+    def _build_prompt(self, text: str) -> str:
+        return ANALYSIS_PROMPT.format(text=text)
+
+    # Prompt asking Gemini to update an earlier analysis from a diff of the documents
+    # Returns None when the diff is too large to be worth it
+    def _build_diff_prompt(self, previous_summary: str, previous_text: str, text: str) -> Optional[str]:
+        diff = "\n".join(difflib.unified_diff(
+            previous_text.splitlines(), text.splitlines(), 'previous', 'revised', n=1, lineterm=''
+        ))
+        if len(diff) > config.SIMILARITY_MAX_DIFF_CHARS or len(diff) > len(text) // 2:
+            return None
+        return DIFF_PROMPT.format(previous_summary=previous_summary, diff=diff)
+
+    # Prompt for analyzing a single clause (clause mode)
+    def _build_clause_prompt(self, clause: str, opening: bool) -> str:
+        if opening:
+            intro = "This is the opening of a legal document (title, parties, recitals or first clause)."
+            header = 'Document Type: [type]\nParties: [the parties, or "not stated"]\n'
+        else:
+            intro = "This is one clause of a legal document."
+            header = ""
+        return CLAUSE_PROMPT.format(intro=intro, clause=clause, header=header)
+
+    # Prompt for summarizing one chunk of a long document (map step)
+    def _build_chunk_prompt(self, chunk: str, part: int, total_parts: int) -> str:
+        return CHUNK_PROMPT.format(part=part, total_parts=total_parts, chunk=chunk)
+
+    # Prompt for merging chunk summaries into the standard format (reduce step)
+    def _build_reduce_prompt(self, partial_summaries: List[str]) -> str:
+        parts = "\n\n".join(
+            f"Part {i + 1}:\n{summary}" for i, summary in enumerate(partial_summaries)
+        )
+        return REDUCE_PROMPT.format(parts=parts)
+
+    # Pull the summary text and usage metadata out of a Gemini response
+    # Returns None if the response was blocked
+    def _parse_response(self, response) -> Optional[Tuple[str, Dict]]:
+        if not response.parts:
+            return None
+
+        usage_metadata = {
+            'prompt_tokens': response.usage_metadata.prompt_token_count,
+            'completion_tokens': response.usage_metadata.candidates_token_count,
+            'total_tokens': response.usage_metadata.total_token_count,
+        }
+        return response.text, usage_metadata
+
     # Return fallback response when API fails or blocks content
-    def _get_fallback_response(self, text: str) -> Tuple[str, List[str], Dict]:
+    def _get_fallback_response(self, text: str, route: Optional[ModelRoute] = None) -> Tuple[str, List[str], Dict]:
         summary = f"""
             Document Analysis (Fallback)
 
@@ -109,56 +721,75 @@ class GeminiClient:
 
             Manual Review Recommended: Please review the document for specific terms, obligations, and conditions.
         """
-        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        usage_metadata = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'fallback': True}
+        if route is not None:
+            usage_metadata['model_tier'] = route.tier
         return summary, [], usage_metadata
-    
+
     # Extract legal terms that Gemini identified from the summary
     def _extract_terms_from_summary(self, summary: str) -> List[str]:
         terms = []
-        
+
         # Check if Gemini included a legal terms section
-        if "Legal Terms Found:" in summary:
+        if "**Legal Terms Found:**" in summary:
             terms_section = summary.split("**Legal Terms Found:**")[1]
         elif "Legal Terms Found:" in summary:
             terms_section = summary.split("Legal Terms Found:")[1]
         else:
             return terms
-        
+
         # Extract terms from bullet points
-        term_patterns = re.findall(r'[-*•]\s*([a-zA-Z\s]+)', terms_section)
-        
+        # Hyphens are allowed inside a term so "at-will" and "non-compete" stay whole
+        term_patterns = re.findall(r'[-*•]\s*([a-zA-Z][a-zA-Z\s\-]*)', terms_section)
+
         # Clean up the terms
         for term in term_patterns:
-            cleaned_term = term.strip().lower()
+            cleaned_term = term.strip(' \t\n-').lower()
             if cleaned_term and not cleaned_term.startswith('**'):
                 terms.append(cleaned_term)
-        
+
         # Limit to 10 terms
         return terms[:10]
 
     # Look up definitions for the legal terms that Gemini identified
-    def _enhance_with_definitions(self, summary: str, ai_identified_terms: List[str]) -> str:
+    # Returns: (summary, terms_looked_up)
+    def _enhance_with_definitions(self, summary: str, ai_identified_terms: List[str]) -> Tuple[str, List[str]]:
         if not ai_identified_terms:
-            return summary
-        
-        # Look up definitions for the terms (limit to 3 to avoid too many API calls)
-        definitions_section = "\nLegal Terms Explained:\n"
-        
-        terms_defined = 0
-        for term in ai_identified_terms:
-            if terms_defined >= 3:
-                break
-                
-            result = legal_term_lookup.lookup(term)
-            if result:
-                self.terms_looked_up.append(term)
-                definitions_section += f"• {legal_term_lookup.format_definition(result)}\n\n"
-                terms_defined += 1
-        
+            return summary, []
+
+        # Look up definitions for the terms (limited to avoid too many API calls)
+        with metrics.span("term_definitions"):
+            results = legal_term_lookup.lookup_many(ai_identified_terms, config.DEFINITION_LOOKUP_LIMIT)
+
+        return self._append_definitions(summary, results)
+
+    # Speculative lookups for terms in the document, overlapping the model call
+    def _start_prefetch(self, text: str) -> Optional[TermPrefetch]:
+        return TermPrefetch(text) if config.TERM_PREFETCH_ENABLED else None
+
+    # Async version of _enhance_with_definitions; reuses lookups a TermPrefetch already made
+    async def _enhance_with_definitions_async(self, summary: str, ai_identified_terms: List[str],
+                                              prefetch: Optional[TermPrefetch] = None) -> Tuple[str, List[str]]:
+        if not ai_identified_terms:
+            return summary, []
+
+        with metrics.span("term_definitions"):
+            results = await legal_term_lookup.lookup_many_async(
+                ai_identified_terms, config.DEFINITION_LOOKUP_LIMIT, prefetch
+            )
+
+        return self._append_definitions(summary, results)
+
+    # Append the "Legal Terms Explained" section for the found definitions
+    def _append_definitions(self, summary: str, results: List[Tuple[str, Dict]]) -> Tuple[str, List[str]]:
         # Only add section if definitions found
-        if terms_defined > 0:
-            return summary + definitions_section
-        
-        return summary
+        if not results:
+            return summary, []
+
+        definitions_section = "\nLegal Terms Explained:\n"
+        for _, result in results:
+            definitions_section += f"• {legal_term_lookup.format_definition(result)}\n\n"
+
+        return summary + definitions_section, [term for term, _ in results]
 
-gemini_client = GeminiClient()
\ No newline at end of file
+gemini_client = GeminiClient()
@@ -0,0 +1,116 @@
+import json
+import re
+import threading
+from typing import Optional, Dict, List
+from .config import config
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Reduce a word to a crude singular form so "indemnities" matches "indemnity"
+def lemmatize(word: str) -> str:
+    if len(word) <= 3 or word.endswith('ss') or word.endswith('us') or word.endswith('is'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+# Split a term into lowercase word tokens, treating hyphens and slashes as spaces
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+# Lemma key used for plural- and punctuation-insensitive matching
+def term_key(term: str) -> str:
+    return ' '.join(lemmatize(word) for word in tokenize(term))
+
+# Bundled offline legal glossary with an in-memory term index, built on first use
+class LegalGlossary:
+    def __init__(self, glossary_file: str = None):
+        self.glossary_file = glossary_file or config.GLOSSARY_FILE
+        # Exact lowercase term -> entry
+        self._exact = {}
+        # Lemma key -> entry
+        self._by_key = {}
+        # First word of a phrase -> set of phrase lengths (in words) that start with it
+        self._phrase_lengths = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(set(id(entry) for entry in self._by_key.values()))
+
+    # Look up a term by exact match, then by lemma/plural-insensitive key
+    def lookup(self, term: str) -> Optional[Dict]:
+        self._ensure_loaded()
+        entry = self._exact.get(term.strip().lower())
+        if entry is None:
+            entry = self._by_key.get(term_key(term))
+        if entry is None:
+            return None
+
+        return {
+            'term': entry['term'],
+            'definition': entry['definition'],
+            'part_of_speech': entry['part_of_speech'],
+            'source': 'legal_glossary'
+        }
+
+    # Find glossary terms (including multi-word phrases) in free text
+    # Returns canonical terms in order of first appearance
+    def find_terms(self, text: str) -> List[str]:
+        self._ensure_loaded()
+        words = [lemmatize(word) for word in tokenize(text)]
+        found = []
+        seen = set()
+
+        for i, word in enumerate(words):
+            lengths = self._phrase_lengths.get(word)
+            if not lengths:
+                continue
+            # Prefer the longest phrase starting here ("liquidated damages" over "damages")
+            for length in lengths:
+                entry = self._by_key.get(' '.join(words[i:i + length]))
+                if entry is not None:
+                    if entry['term'] not in seen:
+                        seen.add(entry['term'])
+                        found.append(entry['term'])
+                    break
+
+        return found
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    # Load the glossary file and build the exact, lemma and phrase indexes
+    def _load(self):
+        try:
+            with open(self.glossary_file, 'r') as f:
+                terms = json.load(f)['terms']
+        except Exception as e:
+            print(f"Error loading legal glossary: {e}")
+            return
+
+        for entry in terms:
+            for name in [entry['term']] + entry.get('aliases', []):
+                key = term_key(name)
+                if not key:
+                    continue
+                self._exact.setdefault(name.lower(), entry)
+                self._by_key.setdefault(key, entry)
+                words = key.split(' ')
+                self._phrase_lengths.setdefault(words[0], set()).add(len(words))
+
+        self._phrase_lengths = {
+            word: sorted(lengths, reverse=True) for word, lengths in self._phrase_lengths.items()
+        }
+
+legal_glossary = LegalGlossary()
@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Tuple, List
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
+from .config import config
+from .compaction import PAGE_BREAK
+
+# Raised from inside the request stream once the upload passes the size cap
+class UploadTooLarge(Exception):
+    pass
+
+# Extract text from a range of PDF pages - runs in a worker process
+def _extract_page_range(path: str, start: int, end: int) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return PAGE_BREAK.join((reader.pages[i].extract_text() or "") for i in range(start, end))
+
+def _count_pages(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+# Receives uploaded documents and turns them into text for the analysis pipeline
+class DocumentIngestor:
+    def __init__(self):
+        self.max_bytes = config.MAX_UPLOAD_BYTES
+        self.pages_per_task = config.PDF_PAGES_PER_TASK
+        self._pool = None
+
+    # Parse a multipart upload, spooling the file to a temp file as it arrives
+    # The size cap is enforced while the body is being read, not after
+    # Returns: (upload, document_name)
+    async def receive_upload(self, request: Request) -> Tuple[UploadFile, str]:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise HTTPException(status_code=413, detail=self._too_large_message())
+
+        content_type = request.headers.get("content-type", "")
+        if not content_type.startswith("multipart/form-data"):
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+        parser = MultiPartParser(request.headers, self._capped_stream(request), max_files=1, max_fields=10)
+        try:
+            form = await parser.parse()
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=self._too_large_message())
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="No file provided. Send the document in a 'file' field.")
+
+        document_name = form.get("document_name") or upload.filename or "uploaded_document"
+        return upload, document_name
+
+    # Extract the text of an uploaded TXT or PDF file
+    async def extract_text(self, upload: UploadFile) -> str:
+        filename = (upload.filename or "").lower()
+        is_pdf = filename.endswith(".pdf") or upload.content_type == "application/pdf"
+
+        try:
+            if is_pdf:
+                return await self._extract_pdf(upload)
+
+            await upload.seek(0)
+            data = await upload.read()
+            return data.decode("utf-8", errors="replace")
+        finally:
+            await upload.close()
+
+    # Extract PDF pages in parallel worker processes so large files don't block the server
+    async def _extract_pdf(self, upload: UploadFile) -> str:
+        loop = asyncio.get_running_loop()
+
+        # Worker processes need a real path, so copy the spooled upload to disk
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            path = f.name
+            await upload.seek(0)
+            await loop.run_in_executor(None, shutil.copyfileobj, upload.file, f)
+
+        try:
+            pool = self._get_pool()
+            try:
+                page_count = await loop.run_in_executor(pool, _count_pages, path)
+                ranges = [
+                    (start, min(start + self.pages_per_task, page_count))
+                    for start in range(0, page_count, self.pages_per_task)
+                ]
+                parts: List[str] = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _extract_page_range, path, start, end) for start, end in ranges
+                ))
+            except BrokenProcessPool:
+                # A worker process died - that's a server problem, not a bad file; start a new pool next time
+                self._pool = None
+                raise
+            except Exception:
+                # pypdf raises a variety of errors for malformed files and pages
+                raise HTTPException(status_code=400, detail="Could not read the PDF file.")
+            return PAGE_BREAK.join(part for part in parts if part.strip())
+        finally:
+            os.remove(path)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned rather than forked: forking a process that runs the event loop and
+            # background threads can copy locks in a held state
+            self._pool = ProcessPoolExecutor(
+                max_workers=config.PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    # Pass the request body through, failing as soon as it exceeds the size cap
+    async def _capped_stream(self, request: Request):
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise UploadTooLarge()
+            yield chunk
+
+    def _too_large_message(self) -> str:
+        return f"Upload too large. Maximum {self.max_bytes / (1024 * 1024):.1f} MB allowed."
+
+document_ingestor = DocumentIngestor()
@@ -0,0 +1,26 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - no advisory locks, run a single worker
+    fcntl = None
+
+# Whether file_lock actually excludes other processes on this platform
+PROCESS_LOCKS_AVAILABLE = fcntl is not None
+
+# Exclusive advisory lock shared by every process (and thread) that locks the same path
+# The lock lives in a "<path>.lock" sidecar so the data file itself can be replaced freely
+@contextmanager
+def file_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
@@ -1,15 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
+import json
 import time
+from contextlib import asynccontextmanager
+from typing import Optional
 from datetime import datetime
-from .models import AnalyzeRequest, AnalyzeResponse, LogEntry, Summary
+from .models import AnalyzeRequest, AnalyzeResponse, LogEntry, Summary, BatchRequest, BatchCreated
 from .safety import safety_checker
 from .gemini_client import gemini_client
 from .telemetry import telemetry_logger
+from .cache import analysis_cache, clause_cache
+from .batches import batch_runner
+from .ingest import document_ingestor
+from .metrics import metrics
+from .scheduler import ModelBusyError
 
-app = FastAPI(title="Legal Document Analyzer", version="1.0.0")
+# Start batch workers, resuming any jobs left unfinished by a restart
+# Telemetry storage is opened here rather than on the first request
+# On shutdown, stop batch workers and flush queued telemetry to disk before the process exits
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    telemetry_logger.start()
+    batch_runner.start(record_analysis)
+    try:
+        yield
+    finally:
+        await batch_runner.stop()
+        document_ingestor.shutdown()
+        telemetry_logger.close()
+
+app = FastAPI(title="Legal Document Analyzer", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -33,17 +55,124 @@ async def root():
 @app.post("/api/analyze", response_model=AnalyzeResponse)
 async def analyze_document(request: AnalyzeRequest):
     start_time = time.time()
+    metrics.start_request()
     
     # Safety checks
-    valid, error_msg = safety_checker.validate_input(request.text)
+    with metrics.span("safety_check"):
+        valid, error_msg = safety_checker.validate_input(request.text)
     if not valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
     # Analyze with Gemini
-    summary, terms_looked_up, usage_metadata = gemini_client.analyze_document(request.text)
+    try:
+        summary, terms_looked_up, usage_metadata = await gemini_client.analyze_document_async(request.text, request.mode)
+    except ModelBusyError as e:
+        log_error(request, start_time, str(e))
+        raise model_busy(e)
     
+    return record_analysis(request, summary, terms_looked_up, usage_metadata, start_time)
+
+# Upload endpoint: Analyze an uploaded TXT or PDF file (multipart field "file")
+# The file is spooled to disk as it arrives and PDF pages are extracted in worker processes
+@app.post("/api/analyze/upload", response_model=AnalyzeResponse)
+async def analyze_upload(request: Request):
+    start_time = time.time()
+    metrics.start_request()
+
+    with metrics.span("upload_ingest"):
+        upload, document_name = await document_ingestor.receive_upload(request)
+        text = await document_ingestor.extract_text(upload)
+
+    # Safety checks
+    with metrics.span("safety_check"):
+        valid, error_msg = safety_checker.validate_input(text)
+    if not valid:
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    analyze_request = AnalyzeRequest(text=text, document_name=document_name)
+    try:
+        summary, terms_looked_up, usage_metadata = await gemini_client.analyze_document_async(text)
+    except ModelBusyError as e:
+        log_error(analyze_request, start_time, str(e))
+        raise model_busy(e)
+
+    return record_analysis(analyze_request, summary, terms_looked_up, usage_metadata, start_time)
+
+# Streaming endpoint: Analyze a legal document and send the output as server-sent events
+# Events: "chunk" (summary text as it is generated), "terms" (definitions section),
+# "done" (same fields as /api/analyze plus timings) and "error"
+@app.post("/api/analyze/stream")
+async def analyze_document_stream(request: AnalyzeRequest):
+    start_time = time.time()
+    stages = metrics.start_request()
+
+    # Safety checks run before the stream starts so rejections are still plain 400s
+    with metrics.span("safety_check"):
+        valid, error_msg = safety_checker.validate_input(request.text)
+    if not valid:
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    async def event_stream():
+        # The body is streamed after the handler returns - keep timing into the same request
+        metrics.resume_request(stages)
+        first_token_ms = None
+        try:
+            async for event in gemini_client.analyze_document_stream(request.text, request.mode):
+                if event['type'] == 'chunk':
+                    if first_token_ms is None:
+                        first_token_ms = (time.time() - start_time) * 1000
+                    yield sse_event('chunk', {'text': event['text']})
+                elif event['type'] == 'terms':
+                    yield sse_event('terms', {'text': event['text'], 'terms_looked_up': event['terms_looked_up']})
+                elif event['type'] == 'done':
+                    response = record_analysis(
+                        request, event['summary'], event['terms_looked_up'], event['usage_metadata'],
+                        start_time, time_to_first_token_ms=first_token_ms
+                    )
+                    done = response.dict()
+                    done['time_to_first_token_ms'] = first_token_ms
+                    done['latency_ms'] = (time.time() - start_time) * 1000
+                    yield sse_event('done', done)
+        except ModelBusyError as e:
+            log_error(request, start_time, str(e), time_to_first_token_ms=first_token_ms)
+            yield sse_event('error', {'detail': model_busy(e).detail, 'retry_after': e.retry_after})
+        except Exception as e:
+            log_error(request, start_time, str(e), time_to_first_token_ms=first_token_ms)
+            yield sse_event('error', {'detail': 'Analysis failed while streaming. Please try again.'})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 503 with Retry-After for when Gemini stays over quota after all retries
+def model_busy(error: ModelBusyError) -> HTTPException:
+    retry_after = max(1, round(error.retry_after))
+    return HTTPException(
+        status_code=503,
+        detail=f"The analysis service is busy. Please try again in {retry_after} seconds.",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+# Format one server-sent event
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Save the summary, log telemetry and build the API response for a finished analysis
+def record_analysis(request: AnalyzeRequest, summary: str, terms_looked_up: list, usage_metadata: dict,
+                    start_time: float, time_to_first_token_ms: Optional[float] = None) -> AnalyzeResponse:
     # Determine pathway
-    pathway = "legal_term_lookup" if terms_looked_up else "none"
+    if usage_metadata.get('cache_hit'):
+        pathway = "cache_hit"
+    elif usage_metadata.get('fallback'):
+        pathway = "fallback"
+    elif usage_metadata.get('near_duplicate') == 'reuse':
+        pathway = "near_duplicate"
+    elif terms_looked_up:
+        pathway = "legal_term_lookup"
+    else:
+        pathway = "none"
     
     # Calculate metrics
     tokens_used = usage_metadata.get('total_tokens', 0)
@@ -68,11 +197,17 @@ async def analyze_document(request: AnalyzeRequest):
         timestamp=timestamp,
         pathway=pathway,
         latency_ms=latency_ms,
+        time_to_first_token_ms=time_to_first_token_ms,
         tokens_used=tokens_used,
         input_length=len(request.text),
-        success=True
+        success=True,
+        stages=metrics.current_stages(),
+        coalesced=bool(usage_metadata.get('coalesced')),
+        model_tier=usage_metadata.get('model_tier'),
+        prompt_tokens_saved=usage_metadata.get('prompt_tokens_saved')
     )
     telemetry_logger.log_request(log_entry)
+    record_request_metrics(pathway, latency_ms, usage_metadata, time_to_first_token_ms)
     
     return AnalyzeResponse(
         summary=summary,
@@ -82,9 +217,99 @@ async def analyze_document(request: AnalyzeRequest):
         timestamp=timestamp
     )
 
-# Get all saved summaries
+# Log a failed analysis
+def log_error(request: AnalyzeRequest, start_time: float, error_message: str,
+              time_to_first_token_ms: Optional[float] = None):
+    latency_ms = (time.time() - start_time) * 1000
+    telemetry_logger.log_request(LogEntry(
+        timestamp=datetime.now().isoformat(),
+        pathway="error",
+        latency_ms=latency_ms,
+        time_to_first_token_ms=time_to_first_token_ms,
+        tokens_used=0,
+        input_length=len(request.text),
+        success=False,
+        error_message=error_message,
+        stages=metrics.current_stages()
+    ))
+    record_request_metrics("error", latency_ms, {}, time_to_first_token_ms)
+
+# Aggregate request-level latency and token counters for /metrics
+def record_request_metrics(pathway: str, latency_ms: float, usage_metadata: dict,
+                           time_to_first_token_ms: Optional[float] = None):
+    metrics.increment("requests_total", pathway=pathway)
+    metrics.observe("request_latency_ms", latency_ms, pathway=pathway)
+    if time_to_first_token_ms is not None:
+        metrics.observe("time_to_first_token_ms", time_to_first_token_ms)
+    metrics.increment("tokens_total", usage_metadata.get('prompt_tokens') or 0, kind="prompt")
+    metrics.increment("tokens_total", usage_metadata.get('completion_tokens') or 0, kind="completion")
+    metrics.increment("prompt_tokens_saved_total", usage_metadata.get('prompt_tokens_saved') or 0)
+
+    # Per model tier: requests by outcome (fallback, escalated to the standard tier, ok), latency, tokens
+    tier = usage_metadata.get('model_tier')
+    if tier is None:
+        return
+    if usage_metadata.get('fallback'):
+        outcome = "fallback"
+    elif usage_metadata.get('escalated'):
+        outcome = "escalated"
+    else:
+        outcome = "ok"
+    metrics.increment("model_tier_requests_total", tier=tier, outcome=outcome)
+    metrics.observe("model_tier_latency_ms", latency_ms, tier=tier)
+    metrics.increment("model_tier_tokens_total", usage_metadata.get('prompt_tokens') or 0, tier=tier, kind="prompt")
+    metrics.increment("model_tier_tokens_total", usage_metadata.get('completion_tokens') or 0, tier=tier, kind="completion")
+
+# Submit many documents for analysis as one background job
+@app.post("/api/batches", response_model=BatchCreated, status_code=202)
+async def create_batch(request: BatchRequest):
+
+    job_id = batch_runner.submit(request.documents)
+    return BatchCreated(job_id=job_id, total=len(request.documents))
+
+# Get per-document progress of a batch job
+@app.get("/api/batches/{job_id}")
+async def get_batch(job_id: str):
+
+    job = batch_runner.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+# List saved summaries, newest first, without the summary body
+# Pass next_cursor back as cursor to fetch the next page; start and end are inclusive
+# Plain def so the SQLite reads (and the wait for queued inserts) run in the threadpool
 @app.get("/api/summaries")
-async def get_summaries():
-    
-    summaries = telemetry_logger.get_all_summaries()
-    return {"summaries": summaries}
\ No newline at end of file
+def get_summaries(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    document_name: Optional[str] = None,
+):
+
+    if cursor is not None and not (cursor.isascii() and cursor.isdigit()):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    summaries, next_cursor = telemetry_logger.list_summaries(limit, cursor, start, end, document_name)
+    return {"summaries": summaries, "next_cursor": next_cursor}
+
+# Get one full saved summary
+@app.get("/api/summaries/{summary_id}")
+def get_summary(summary_id: str):
+
+    summary = telemetry_logger.get_summary(summary_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return summary
+
+# Analysis cache hit/miss counters
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+
+    return {**analysis_cache.stats(), 'clause': clause_cache.stats()}
+
+# Prometheus metrics: per-stage latency quantiles, token and cache counters
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Callable, List
+
+# Per-request stage timings, shared by every task and thread the request spawns
+_current_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("current_stages", default=None)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Latency distribution for one metric: running count/sum plus a window of recent samples for quantiles
+class LatencyHistogram:
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self._samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self._samples:
+            return {q: 0.0 for q in QUANTILES}
+        ordered = sorted(self._samples)
+        return {q: _pick(ordered, q) for q in QUANTILES}
+
+    # Any quantile of the recent samples, not just the reported ones
+    def quantile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        return _pick(sorted(self._samples), q)
+
+def _pick(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# In-process metrics: per-stage latency histograms, counters and gauges
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, LatencyHistogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[str, Callable[[], Dict[tuple, float]]] = {}
+
+    # Start collecting stage timings for a new request
+    def start_request(self) -> Dict[str, float]:
+        stages = {}
+        _current_stages.set(stages)
+        return stages
+
+    # Continue collecting into an existing request's timings (e.g. from a streaming body)
+    def resume_request(self, stages: Dict[str, float]):
+        _current_stages.set(stages)
+
+    # Stage timings (ms) collected so far for the current request
+    def current_stages(self) -> Dict[str, float]:
+        stages = _current_stages.get()
+        return dict(stages) if stages else {}
+
+    # Time a block of code as one stage
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, (time.perf_counter() - start) * 1000)
+
+    # Record a stage duration in the histogram and on the current request
+    def record_stage(self, stage: str, duration_ms: float):
+        self.observe("stage_latency_ms", duration_ms, stage=stage)
+        stages = _current_stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + duration_ms
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    # Register a callback returning {labels_tuple: value} that is read at scrape time
+    def register_gauge(self, name: str, callback: Callable[[], Dict[tuple, float]]):
+        self._gauges[name] = callback
+
+    # Plain-dict copy of every histogram and counter, e.g. for benchmark reports
+    # Returns: {"histograms": {name: [{labels, count, sum, quantiles}]}, "counters": {name: [{labels, value}]}}
+    def snapshot(self) -> Dict[str, Dict[str, List[Dict]]]:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            quantiles = {key: histogram.quantiles() for key, histogram in histograms}
+
+        result = {'histograms': {}, 'counters': {}}
+        for (name, labels), histogram in histograms:
+            result['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': histogram.total,
+                'quantiles': {str(q): value for q, value in quantiles[(name, labels)].items()},
+            })
+        for (name, labels), value in counters:
+            result['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return result
+
+    # Render everything in the Prometheus text exposition format
+    # Every series carries a worker label (the process ID) since each server process keeps
+    # its own registry and a scrape is answered by whichever process gets the connection
+    def render_prometheus(self, prefix: str = "legal_analyzer") -> str:
+        lines: List[str] = []
+        worker = (('worker', str(os.getpid())),)
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            quantiles = {key: histogram.quantiles() for key, histogram in histograms}
+
+        seen = set()
+        for (name, labels), histogram in histograms:
+            metric = f"{prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} summary")
+                seen.add(metric)
+            for q, value in quantiles[(name, labels)].items():
+                lines.append(f"{metric}{_format_labels(worker + labels + (('quantile', str(q)),))} {value:.3f}")
+            lines.append(f"{metric}_sum{_format_labels(worker + labels)} {histogram.total:.3f}")
+            lines.append(f"{metric}_count{_format_labels(worker + labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(worker + labels)} {value:g}")
+
+        for name, callback in sorted(self._gauges.items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            try:
+                values = callback()
+            except Exception:
+                continue
+            for labels, value in sorted(values.items()):
+                lines.append(f"{metric}{_format_labels(worker + labels)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+metrics = MetricsRegistry()
@@ -1,10 +1,22 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Literal
+from .config import Config
 
 # Validates incoming data from the frontend/API
 class AnalyzeRequest(BaseModel):
-    text: str = Field(..., max_length=50000)
+    text: str = Field(..., max_length=Config.MAX_INPUT_CHARS)
     document_name: Optional[str] = "unnamed_document"
+    # "clause" analyzes each numbered clause separately so revisions only re-analyze what changed
+    mode: Optional[Literal["document", "clause"]] = None
+
+# Many documents submitted as one batch job
+class BatchRequest(BaseModel):
+    documents: List[AnalyzeRequest] = Field(..., min_length=1, max_length=Config.BATCH_MAX_DOCUMENTS)
+
+# Returned when a batch job is accepted
+class BatchCreated(BaseModel):
+    job_id: str
+    total: int
 
 # Defines what the API sends back to the user
 class AnalyzeResponse(BaseModel):
@@ -27,9 +39,14 @@ class Summary(BaseModel):
 # Structure for telemetry data saved to logs.json
 class LogEntry(BaseModel):
     timestamp: str
-    pathway: str  # "legal_term_lookup", "none", "error"
+    pathway: str  # "legal_term_lookup", "cache_hit", "near_duplicate", "fallback", "none", "error"
     latency_ms: float
+    time_to_first_token_ms: Optional[float] = None
     tokens_used: Optional[int]
     input_length: int
     success: bool
-    error_message: Optional[str] = None
\ No newline at end of file
+    error_message: Optional[str] = None
+    stages: Optional[Dict[str, float]] = None  # per-stage latency in ms
+    coalesced: bool = False  # result shared with an identical request already in flight
+    model_tier: Optional[str] = None  # "light" or "standard" when the model was called
+    prompt_tokens_saved: Optional[int] = None  # estimated tokens prompt compaction removed
\ No newline at end of file
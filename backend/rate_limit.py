@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Optional
+
+# Refilling token bucket - rate is per minute to match how Gemini quotas are stated
+# Not thread-safe on its own; RateLimiter serializes access
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float, scale: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute * scale / 60)
+
+    # Seconds until amount tokens are available (0 when they already are)
+    def wait_time(self, amount: float, now: float, scale: float = 1.0) -> float:
+        self._refill(now, scale)
+        # Requests bigger than the bucket would never fit - let them through once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / (self.per_minute * scale)
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    # Charge (or refund) the difference once the real cost is known - may go into debt
+    def adjust(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+# Requests-per-minute and tokens-per-minute limiter that slows down when the API returns 429
+# Each 429 halves the effective rate and pauses all callers; successes slowly restore it
+class RateLimiter:
+    MIN_SCALE = 0.1
+    RECOVERY_STEP = 0.05
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.scale = 1.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    # Seconds to wait before a call costing `tokens` may start, reserving it when that is 0
+    def reserve(self, tokens: float = 0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait_time(1, now, self.scale),
+                self.tokens.wait_time(tokens, now, self.scale),
+            )
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                return 0.0
+            return wait
+
+    # Block until a call costing an estimated `tokens` may start
+    def acquire(self, tokens: float = 0):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    # Correct the token bucket once the real usage of a call is known
+    def record_usage(self, estimated_tokens: float, actual_tokens: float):
+        with self._lock:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+        self.recover()
+
+    # The API said we are over quota: slow down and pause everyone for retry_after seconds
+    def backoff(self, retry_after: float):
+        with self._lock:
+            self.scale = max(self.MIN_SCALE, self.scale / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        with self._lock:
+            self.scale = min(1.0, self.scale + self.RECOVERY_STEP)
@@ -0,0 +1,57 @@
+from typing import Dict
+from .config import config
+from .compaction import estimate_text_tokens
+from .glossary import legal_glossary
+from .metrics import metrics
+from .sections import split_sections
+
+LIGHT = "light"
+STANDARD = "standard"
+
+# Model and output budget a document is analyzed with
+class ModelRoute:
+    def __init__(self, tier: str, model: str, max_output_tokens: int):
+        self.tier = tier
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+
+    def __repr__(self) -> str:
+        return f"ModelRoute({self.tier!r}, {self.model!r}, {self.max_output_tokens})"
+
+# Picks a model tier per document from cheap local features: estimated prompt tokens,
+# numbered sections and legal-term density (distinct glossary terms per 100 words)
+# Short, simple documents go to the light tier; everything else uses the standard model
+class ModelRouter:
+    def __init__(self):
+        self.enabled = config.MODEL_ROUTING_ENABLED
+        self.light = ModelRoute(LIGHT, config.GEMINI_LIGHT_MODEL, config.GEMINI_LIGHT_MAX_OUTPUT_TOKENS)
+        self.standard = ModelRoute(STANDARD, config.GEMINI_MODEL, config.GEMINI_MAX_OUTPUT_TOKENS)
+
+    # Features the routing rules look at, for the document as it will be sent (compacted)
+    # Returns: {'tokens', 'words', 'sections', 'term_density'}
+    def profile(self, text: str) -> Dict:
+        words = len(text.split())
+        sections = sum(1 for heading, _ in split_sections(text) if heading)
+        terms = len(legal_glossary.find_terms(text))
+        return {
+            'tokens': estimate_text_tokens(text),
+            'words': words,
+            'sections': sections,
+            'term_density': terms * 100 / words if words else 0.0,
+        }
+
+    # Route for a whole-document analysis
+    def route(self, text: str) -> ModelRoute:
+        if not self.enabled or len(text) > config.LONG_DOCUMENT_THRESHOLD:
+            return self.standard
+
+        with metrics.span("model_routing"):
+            profile = self.profile(text)
+        light = profile['tokens'] <= config.ROUTING_LIGHT_MAX_TOKENS and \
+            profile['sections'] <= config.ROUTING_LIGHT_MAX_SECTIONS and \
+            profile['term_density'] <= config.ROUTING_LIGHT_MAX_TERM_DENSITY
+        route = self.light if light else self.standard
+        metrics.increment("model_routes_total", tier=route.tier)
+        return route
+
+model_router = ModelRouter()
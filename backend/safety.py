@@ -1,36 +1,195 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Optional, List, Tuple
 from backend.config import Config
 
+# Apostrophe variants treated as the same character ("i'm" / "i’m")
+_APOSTROPHES = "'\u2018\u2019\u02bc"
+# Invisible characters sometimes used to split a pattern ("ign​ore")
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u00ad"))
+
+# Canonical form of a pattern or matched text: casefolded, single spaces, plain apostrophes
+def _canonical(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text.casefold().strip())
+    return re.sub(f"[{_APOSTROPHES}]", "'", text)
+
+# Regex fragment for one pattern character
+def _char_regex(ch: str) -> str:
+    if ch == ' ':
+        return r'\s+'
+    if ch == "'":
+        return f"[{_APOSTROPHES}]"
+    return re.escape(ch)
+
+# Pattern sets up to this size are matched pattern by pattern behind a word prefilter (a few
+# substring searches, faster than any regex pass over the text); larger sets use one trie regex
+PREFILTER_MAX_PATTERNS = 100
+
+# Text is lowercased (and normalized, if not ASCII) a window at a time rather than copied whole;
+# a match that crosses a window boundary is found as long as it fits in the overlap
+SCAN_WINDOW_CHARS = 65536
+SCAN_OVERLAP_CHARS = 1024
+
+# Whitespace-tolerant regex for one canonical pattern
+def _pattern_regex(canonical: str) -> str:
+    return ''.join(_char_regex(ch) for ch in canonical)
+
+# Words any match of the pattern contains verbatim, longest (most selective) first
+def _required_words(canonical: str) -> List[str]:
+    return sorted(set(re.findall(r"[^\s']+", canonical)), key=len, reverse=True)
+
+# Turn a character trie into a regex so shared prefixes are only matched once
+def _trie_regex(node: dict) -> str:
+    is_end = '' in node
+    branches = [_char_regex(ch) + _trie_regex(child) for ch, child in node.items() if ch != '']
+
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # A pattern can end here or continue - prefer the longer match
+    return f"(?:{body})?" if is_end else body
+
+# Matches a pattern list against lowercased text
+class _PatternMatcher:
+    def __init__(self, patterns: Tuple[str, ...]):
+        # canonical match text -> original pattern
+        self.lookup = {}
+        for pattern in patterns:
+            canonical = _canonical(pattern)
+            if canonical:
+                self.lookup.setdefault(canonical, pattern)
+
+        self.checks = None
+        self.trie = None
+        if len(self.lookup) <= PREFILTER_MAX_PATTERNS:
+            self.checks = [
+                (pattern, _required_words(canonical), re.compile(_pattern_regex(canonical)))
+                for canonical, pattern in self.lookup.items()
+            ]
+        else:
+            trie = {}
+            for canonical in self.lookup:
+                node = trie
+                for ch in canonical:
+                    node = node.setdefault(ch, {})
+                node[''] = {}
+            self.trie = re.compile(_trie_regex(trie))
+
+    # Matches in a lowercased window, by offset: every match of every pattern, including
+    # matches of different patterns that overlap (the trie reports the longest pattern
+    # starting at each offset)
+    # Returns: [(pattern, offset)], just the first match when first_only
+    def scan(self, window: str, first_only: bool = False) -> List[Tuple[str, int]]:
+        if self.trie is not None:
+            return self._scan_trie(window, first_only)
+
+        present = {}
+
+        def contains(word: str) -> bool:
+            found = present.get(word)
+            if found is None:
+                found = present[word] = word in window
+            return found
+
+        matches = []
+        for pattern, words, regex in self.checks:
+            if not all(contains(word) for word in words):
+                continue
+            if first_only:
+                match = regex.search(window)
+                if match is not None:
+                    matches.append((pattern, match.start()))
+            else:
+                matches.extend((pattern, match.start()) for match in regex.finditer(window))
+
+        matches.sort(key=lambda match: match[1])
+        return matches[:1] if first_only else matches
+
+    def _scan_trie(self, window: str, first_only: bool) -> List[Tuple[str, int]]:
+        matches = []
+        position = 0
+        while True:
+            match = self.trie.search(window, position)
+            if match is None:
+                return matches
+            matches.append((self.lookup[_canonical(match.group(0))], match.start()))
+            if first_only:
+                return matches
+            # Resume inside the match so overlapping patterns are found too
+            position = match.start() + 1
+
+@lru_cache(maxsize=4)
+def _compile_patterns(patterns: Tuple[str, ...]) -> _PatternMatcher:
+    return _PatternMatcher(patterns)
+
+# Lowercase a piece of text, folding compatibility characters (e.g. fullwidth letters)
+# and dropping invisible ones when it is not plain ASCII
+# (re.IGNORECASE on the original text would avoid the copy, but is several times slower)
+def _normalize(text: str) -> str:
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize('NFKC', text).translate(_INVISIBLE).lower()
+
+# Scan text for patterns one normalized window at a time
+# Returns: [(pattern, offset)] - offsets index into the NFKC-normalized window for non-ASCII text
+def _scan(text: str, patterns: Tuple[str, ...], first_only: bool = False) -> List[Tuple[str, int]]:
+    matcher = _compile_patterns(patterns)
+    matches = []
+    for start in range(0, max(len(text), 1), SCAN_WINDOW_CHARS):
+        window = _normalize(text[start:start + SCAN_WINDOW_CHARS + SCAN_OVERLAP_CHARS])
+        last = start + SCAN_WINDOW_CHARS + SCAN_OVERLAP_CHARS >= len(text)
+        for pattern, offset in matcher.scan(window, first_only):
+            # Matches starting in the overlap belong to the next window
+            if offset < SCAN_WINDOW_CHARS or last:
+                matches.append((pattern, start + offset))
+                if first_only:
+                    return matches
+        if last:
+            break
+    return matches
+
 class SafetyChecker:
     # Check if input exceeds maximum length
     @staticmethod
     def check_input_length(text: str) -> tuple[bool, str]:
-        if len(text) > 500000:
-            return False, f"Input too long. Maximum {500000} characters allowed."
+        if len(text) > Config.MAX_INPUT_CHARS:
+            return False, f"Input too long. Maximum {Config.MAX_INPUT_CHARS} characters allowed."
         if len(text) < 50:
             return False, "Input too short. Please provide substantial text to analyze."
         return True, ""
-    
+
+    # Find every injection pattern in the text
+    # Returns: [(pattern, offset)] by offset - offsets index into the NFKC-normalized text for
+    # non-ASCII input; overlapping matches of different patterns are all reported
+    @staticmethod
+    def scan_injection(text: str) -> List[Tuple[str, int]]:
+        return _scan(text, tuple(Config.INJECTION_PATTERNS))
+
+    # Return the first injection pattern found and its offset, or None
+    @staticmethod
+    def find_injection(text: str) -> Optional[Tuple[str, int]]:
+        matches = _scan(text, tuple(Config.INJECTION_PATTERNS), first_only=True)
+        return matches[0] if matches else None
+
     # Detect prompt injection attempts
     @staticmethod
     def detect_injection(text: str) -> tuple[bool, str]:
-
-        text_lower = text.lower()
-        for pattern in Config.INJECTION_PATTERNS:
-            if pattern in text_lower:
-                return True, f"Security violation detected. This request cannot be processed."
+        if SafetyChecker.find_injection(text) is not None:
+            return True, f"Security violation detected. This request cannot be processed."
         return False, ""
-    
-    # Run all safety checks    
+
+    # Run all safety checks
     @staticmethod
     def validate_input(text: str) -> tuple[bool, str]:
         valid, msg = SafetyChecker.check_input_length(text)
         if not valid:
             return False, msg
-        
+
         is_injection, msg = SafetyChecker.detect_injection(text)
         if is_injection:
             return False, msg
-        
+
         return True, ""
 
-safety_checker = SafetyChecker()
\ No newline at end of file
+safety_checker = SafetyChecker()
@@ -0,0 +1,312 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+from .config import config
+from .metrics import metrics, LatencyHistogram
+from .rate_limit import RateLimiter
+from .compaction import estimate_text_tokens
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, STATE_VALUES, CLOSED
+
+# Lower numbers are sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Priority of the model calls made by the current request (batch workers lower it)
+_current_priority: ContextVar[int] = ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+# Errors worth retrying: quota (429), transient server-side failures (5xx) and our own call timeout
+# google.api_core is slow to import and only needed once a call fails, so it is loaded then
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    from google.api_core.exceptions import (
+        TooManyRequests, InternalServerError, BadGateway, ServiceUnavailable, DeadlineExceeded
+    )
+    return (TooManyRequests, InternalServerError, BadGateway, ServiceUnavailable, DeadlineExceeded,
+            asyncio.TimeoutError)
+
+def is_rate_limited(error: Exception) -> bool:
+    from google.api_core.exceptions import TooManyRequests
+    return isinstance(error, TooManyRequests)
+
+# The model stayed rate limited or unavailable after every retry
+class ModelBusyError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Model is busy, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def set_priority(priority: int):
+    _current_priority.set(priority)
+
+# Rough token count for quota accounting: ~4 characters per token for the prompt and
+# system instruction, plus a share of the output budget
+def estimate_tokens(prompt: str, max_output_tokens: int = 0) -> int:
+    return estimate_text_tokens(prompt) + estimate_text_tokens(config.SYSTEM_PROMPT) + max_output_tokens // 4
+
+# Delay before retrying a failed call: the API's suggested delay when it gives one,
+# else exponential backoff with full jitter
+def retry_delay(error: Exception, attempt: int) -> float:
+    match = re.search(r'retry[ _]?(?:in|delay)[^0-9]*([0-9.]+)', str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return random.uniform(0, min(config.GEMINI_RETRY_MAX_DELAY, config.GEMINI_RETRY_BASE_DELAY * 2 ** attempt))
+
+# Central gate for outbound Gemini calls: RPM/TPM accounting, a concurrency cap,
+# a priority queue (interactive before batch), retries for 429/5xx responses,
+# a circuit breaker and optional hedging
+class GeminiScheduler:
+    def __init__(self, max_concurrency: int, requests_per_minute: float, tokens_per_minute: float):
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = config.GEMINI_MAX_RETRIES
+        self.call_timeout = config.GEMINI_CALL_TIMEOUT
+        self.breaker = None
+        if config.CIRCUIT_BREAKER_ENABLED:
+            self.breaker = CircuitBreaker(
+                config.CIRCUIT_BREAKER_WINDOW,
+                config.CIRCUIT_BREAKER_MIN_CALLS,
+                config.CIRCUIT_BREAKER_FAILURE_RATE,
+                config.CIRCUIT_BREAKER_SLOW_CALL_MS,
+                config.CIRCUIT_BREAKER_OPEN_SECONDS,
+                on_transition=lambda state: metrics.increment("circuit_breaker_transitions_total", state=state),
+            )
+            metrics.register_gauge("circuit_breaker_state", lambda: {(): STATE_VALUES[self.breaker.state]})
+        self.hedge_enabled = config.GEMINI_HEDGE_ENABLED
+        # Latency of recent successful calls, for the hedge delay
+        self._latency = LatencyHistogram(window=500)
+        self._queue = []
+        self._order = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop = None
+
+        metrics.register_gauge("scheduler_queue_depth", lambda: {(): self.queue_depth})
+        metrics.register_gauge("scheduler_in_flight", lambda: {(): self._in_flight})
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for entry in self._queue if not entry[3].done())
+
+    # Run an async model call through the queue, retrying 429/5xx with jittered backoff
+    # Returns the model response
+    async def run(self, call: Callable[[], Awaitable], estimated_tokens: int):
+        if self.hedge_enabled:
+            return await self._run_hedged(call, estimated_tokens)
+        return await self._run_once(call, estimated_tokens)
+
+    async def _run_once(self, call: Callable[[], Awaitable], estimated_tokens: int):
+        async with self.request(call, estimated_tokens) as response:
+            return response
+
+    # Send a second copy of a call that is slower than usual and take whichever answers first
+    async def _run_hedged(self, call: Callable[[], Awaitable], estimated_tokens: int):
+        primary = asyncio.ensure_future(self._run_once(call, estimated_tokens))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay() / 1000)
+            # Only hedge with spare capacity - never ahead of queued work or while degraded
+            if done or self.queue_depth or self._in_flight >= self.max_concurrency or \
+                    (self.breaker is not None and self.breaker.state != CLOSED):
+                return await primary
+
+            hedge = asyncio.ensure_future(self._run_once(call, estimated_tokens))
+            labels = {primary: "primary", hedge: "hedge"}
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        metrics.increment("gemini_hedges_total", winner=labels[task])
+                        return task.result()
+            metrics.increment("gemini_hedges_total", winner="none")
+            return primary.result()
+        finally:
+            # The loser, or both calls if our caller was cancelled - don't hold slots nobody reads
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    # Delay before hedging: the recent latency quantile, but never below the configured floor
+    def _hedge_delay(self) -> float:
+        recent = self._latency.quantile(config.GEMINI_HEDGE_QUANTILE)
+        return max(config.GEMINI_HEDGE_MIN_DELAY_MS, recent)
+
+    # Like run, but keeps the slot held while the caller consumes the response (streaming)
+    @asynccontextmanager
+    async def request(self, call: Callable[[], Awaitable], estimated_tokens: int):
+        priority = _current_priority.get()
+        for attempt in range(self.max_retries + 1):
+            self._before_call(priority)
+            try:
+                await self._acquire(priority, estimated_tokens)
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(call(), self.call_timeout)
+            except retryable_errors() as e:
+                self._release()
+                self._record_failure(e)
+                delay = self._on_retryable_error(e, attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release()
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            self._record_success(start)
+
+            try:
+                yield response
+            finally:
+                self._record_usage(response, estimated_tokens)
+                self._release()
+            return
+
+    # Blocking version for synchronous callers (CLI tools, the test runner)
+    # Uses the same RPM/TPM limiter and retries; there is no queue to jump
+    def run_sync(self, call: Callable, estimated_tokens: int):
+        priority = _current_priority.get()
+        for attempt in range(self.max_retries + 1):
+            self._before_call(priority)
+            self.limiter.acquire(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                response = call()
+            except retryable_errors() as e:
+                self._record_failure(e)
+                time.sleep(self._on_retryable_error(e, attempt))
+                continue
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            self._record_success(start)
+            self._record_usage(response, estimated_tokens)
+            return response
+
+    # Fail fast while the circuit is open: interactive callers get CircuitOpenError (and the
+    # fallback summary), batch work gets ModelBusyError so the document is retried later
+    def _before_call(self, priority: int):
+        if self.breaker is None:
+            return
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            metrics.increment("circuit_breaker_rejections_total")
+            if priority >= PRIORITY_BATCH:
+                raise ModelBusyError(e.retry_after) from e
+            raise
+
+    def _record_success(self, start: float):
+        latency_ms = (time.perf_counter() - start) * 1000
+        self._latency.observe(latency_ms)
+        if self.breaker is not None:
+            self.breaker.record(True, latency_ms)
+
+    # Server errors and timeouts count against the circuit; 429s are a quota problem, not an outage
+    def _record_failure(self, error: Exception):
+        if self.breaker is None:
+            return
+        if is_rate_limited(error):
+            self.breaker.release()
+        else:
+            self.breaker.record(False)
+
+    # Count the error, slow everyone down on a 429, and give up after the last attempt
+    # Returns: seconds to wait before the next attempt
+    def _on_retryable_error(self, error: Exception, attempt: int) -> float:
+        rate_limited = is_rate_limited(error)
+        if rate_limited:
+            reason = "rate_limited"
+        elif isinstance(error, asyncio.TimeoutError):
+            reason = "timeout"
+        else:
+            reason = "server_error"
+        metrics.increment("gemini_retries_total", reason=reason)
+        delay = retry_delay(error, attempt)
+        if attempt == self.max_retries:
+            raise ModelBusyError(max(delay, 1.0)) from error
+        if rate_limited:
+            self.limiter.backoff(delay)
+            return 0.0
+        return delay
+
+    def _record_usage(self, response, estimated_tokens: int):
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None)
+        if actual:
+            self.limiter.record_usage(estimated_tokens, actual)
+        else:
+            self.limiter.recover()
+
+    # Wait for our turn: first in priority order, under the concurrency cap and the rate limits
+    async def _acquire(self, priority: int, estimated_tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), estimated_tokens, waiter))
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Granted just as we were cancelled - hand the slot back
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - start) * 1000
+            metrics.observe("scheduler_wait_ms", wait_ms)
+            metrics.record_stage("scheduler_wait", wait_ms)
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    # Grant slots from the head of the queue while capacity and quota allow
+    def _dispatch(self):
+        while self._queue and self._in_flight < self.max_concurrency:
+            _, _, estimated_tokens, waiter = self._queue[0]
+            if waiter.done():
+                heapq.heappop(self._queue)
+                continue
+
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait > 0:
+                self._schedule_dispatch(wait)
+                return
+
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    # Re-check the queue once the rate limiter has refilled
+    def _schedule_dispatch(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None and self._timer_loop is loop and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+        self._timer_loop = loop
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+# Each server process gets an equal share of the quota
+gemini_scheduler = GeminiScheduler(
+    config.GEMINI_MAX_CONCURRENCY,
+    config.GEMINI_RPM / config.WORKERS,
+    config.GEMINI_TPM / config.WORKERS,
+)
@@ -0,0 +1,97 @@
+import re
+from typing import List, Tuple
+
+# Numbered section headings as used in our contracts, e.g. "4. TERM AND TERMINATION",
+# "Section 12 - Governing Law", "ARTICLE 3. PAYMENT" or "7.2 Limitation of Liability"
+SECTION_HEADING_RE = re.compile(
+    r'^[ \t]*(?:(?:section|article|clause)[ \t]+)?(\d{1,3}(?:\.\d{1,3})*)[.):]?[ \t]+(?:-[ \t]+)?[A-Za-z].*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Split a document into sections on numbered headings
+# Returns: [(heading, section_text)] - text before the first heading has heading ""
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    sections = []
+    matches = list(SECTION_HEADING_RE.finditer(text))
+
+    if not matches:
+        return [("", text)] if text.strip() else []
+
+    preamble = text[:matches[0].start()]
+    if preamble.strip():
+        sections.append(("", preamble))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append((match.group(0).strip(), text[match.start():end]))
+
+    return sections
+
+# Split one oversized piece of text on paragraph breaks, then hard-wrap as a last resort
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    pieces = []
+    current = ""
+    for paragraph in re.split(r'(\n\s*\n)', text):
+        if len(current) + len(paragraph) <= max_chars:
+            current += paragraph
+            continue
+        if current:
+            pieces.append(current)
+        while len(paragraph) > max_chars:
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current = paragraph
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+# Pack consecutive sections into chunks of at most max_chars, never splitting a
+# section unless it is larger than max_chars on its own
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    chunks = []
+    current = ""
+    for _, section in split_sections(text):
+        if len(section) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_oversized(section, max_chars))
+            continue
+        if len(current) + len(section) > max_chars and current:
+            chunks.append(current)
+            current = ""
+        current += section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+# Split a document into clauses for clause-level analysis
+# Sections shorter than min_chars (e.g. a bare "ARTICLE 2" heading) are merged into the next one
+# and sections longer than max_chars are split, so each clause is a reasonable unit of work.
+# Merging is local, so an edit only changes the clauses around it.
+# Returns: [(heading, clause_text)]
+def split_clauses(text: str, min_chars: int, max_chars: int) -> List[Tuple[str, str]]:
+    clauses = []
+    heading, pending = "", ""
+    for section_heading, section in split_sections(text):
+        if not pending:
+            heading = section_heading
+        pending += section
+        if len(pending.strip()) < min_chars:
+            continue
+        clauses.extend(_split_clause(heading, pending, max_chars))
+        pending = ""
+
+    if pending.strip():
+        if clauses and len(clauses[-1][1]) + len(pending) <= max_chars:
+            last_heading, last_text = clauses.pop()
+            clauses.append((last_heading, last_text + pending))
+        else:
+            clauses.extend(_split_clause(heading, pending, max_chars))
+    return clauses
+
+def _split_clause(heading: str, text: str, max_chars: int) -> List[Tuple[str, str]]:
+    if len(text) <= max_chars:
+        return [(heading, text)]
+    pieces = _split_oversized(text, max_chars)
+    return [(heading if i == 0 else f"{heading} (cont.)".strip(), piece) for i, piece in enumerate(pieces)]
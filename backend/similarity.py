@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional, Dict, List, Tuple
+from .config import config
+from .metrics import metrics
+from .locks import file_lock
+
+SHINGLE_WORDS = 5
+_EMPTY = (1 << 64) - 1
+
+# The index file is rewritten without expired and evicted records once they outnumber
+# the live ones (and there are at least this many)
+COMPACT_MIN_DEAD_RECORDS = 100
+
+# Overlapping word n-grams, hashed to 64-bit ints
+def shingle_hashes(text: str) -> List[int]:
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_WORDS:
+        words = [' '.join(words)] if words else []
+    else:
+        words = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return [int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=8).digest(), 'big') for w in words]
+
+# One-permutation MinHash: each shingle is hashed once and kept as the minimum of its bin,
+# so building a signature is O(shingles) instead of O(shingles x permutations)
+def minhash_signature(hashes: List[int], num_bins: int) -> List[int]:
+    signature = [_EMPTY] * num_bins
+    for h in hashes:
+        index = h % num_bins
+        value = h // num_bins
+        if value < signature[index]:
+            signature[index] = value
+    return signature
+
+# Exact Jaccard similarity of two shingle hash lists
+def jaccard(a: List[int], b: List[int]) -> float:
+    a, b = set(a), set(b)
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+# Estimated Jaccard similarity of the two documents' shingle sets
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    both_empty = same = 0
+    for x, y in zip(a, b):
+        if x == y:
+            if x == _EMPTY:
+                both_empty += 1
+            else:
+                same += 1
+    compared = len(a) - both_empty
+    return same / compared if compared else 0.0
+
+# MinHash + LSH index of previously analyzed documents, persisted as NDJSON next to the summaries
+# Signatures and band buckets live in memory; document text and summaries stay on disk and are
+# read back only for the best match, so queries touch a handful of candidates, not the history
+# Other server processes append to the same file; their records are picked up on the next query
+# Records expire after SIMILARITY_TTL_SECONDS and only the newest SIMILARITY_MAX_ENTRIES are
+# kept; the file is compacted (rewritten and replaced) once dead records outnumber live ones,
+# and processes that see the file replaced reload it
+class SimilarityIndex:
+    def __init__(self):
+        self.enabled = config.SIMILARITY_ENABLED
+        self.index_file = config.SIMILARITY_INDEX_FILE
+        self.bands = config.SIMILARITY_BANDS
+        self.rows = config.SIMILARITY_ROWS
+        self.ttl_seconds = config.SIMILARITY_TTL_SECONDS
+        self.max_entries = config.SIMILARITY_MAX_ENTRIES
+        self.num_bins = self.bands * self.rows
+        # doc_id -> (signature, scope, offset, created_at), oldest first
+        self._signatures: Dict[str, Tuple[List[int], str, int, float]] = {}
+        self._buckets: List[Dict[tuple, List[str]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_size = 0
+        self._file_id = None
+        # Records in the file that are not in the index (expired, evicted, duplicates, unreadable)
+        self._dead = 0
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._signatures)
+
+    # Most similar earlier document at or above min_similarity
+    # Candidates come from the LSH buckets and are ranked by estimated similarity; the best
+    # one is then checked with its exact shingle overlap
+    # Returns: (record, similarity) with the stored text and summary, or None
+    def query(self, text: str, scope: str, min_similarity: float) -> Optional[Tuple[Dict, float]]:
+        if not self.enabled:
+            return None
+        self._ensure_loaded()
+        self._refresh()
+
+        with metrics.span("similarity_lookup"):
+            hashes = shingle_hashes(text)
+            signature = minhash_signature(hashes, self.num_bins)
+            best_id, best_similarity, best_offset = None, 0.0, None
+            oldest = time.time() - self.ttl_seconds
+            with self._lock:
+                for doc_id in self._candidates(signature):
+                    stored, stored_scope, offset, created_at = self._signatures[doc_id]
+                    if stored_scope != scope or created_at < oldest:
+                        continue
+                    similarity = estimate_similarity(signature, stored)
+                    if similarity > best_similarity:
+                        best_id, best_similarity, best_offset = doc_id, similarity, offset
+
+            # The estimate is noisy, so allow some slack before the exact check
+            if best_id is None or best_similarity < min_similarity - 0.1:
+                return None
+            record = self._read_record(best_offset)
+            if record is None or record.get('id') != best_id:
+                return None
+            similarity = jaccard(hashes, shingle_hashes(record['text']))
+        return (record, similarity) if similarity >= min_similarity else None
+
+    # Remember an analyzed document; scope ties it to the model/prompt configuration
+    def add(self, doc_id: str, text: str, scope: str, summary: str):
+        if not self.enabled:
+            return
+        self._ensure_loaded()
+
+        signature = minhash_signature(shingle_hashes(text), self.num_bins)
+        created_at = time.time()
+        record = {
+            'id': doc_id,
+            'scope': scope,
+            'signature': signature,
+            'text': text,
+            'summary': summary,
+            'created_at': created_at,
+        }
+        line = (json.dumps(record) + "\n").encode('utf-8')
+        with self._lock:
+            if doc_id in self._signatures:
+                return
+            try:
+                with file_lock(self.index_file), open(self.index_file, 'ab') as f:
+                    offset = f.tell()
+                    f.write(line)
+                    file_id = self._identity(os.fstat(f.fileno()))
+            except OSError as e:
+                print(f"Error writing similarity index: {e}")
+                return
+            if file_id != self._file_id:
+                # Another process compacted the file - our offsets are stale
+                self._reload()
+            else:
+                self._insert(doc_id, signature, scope, offset, created_at)
+                if offset == self._loaded_size:
+                    self._loaded_size = offset + len(line)
+                self._evict()
+            if self._dead >= max(COMPACT_MIN_DEAD_RECORDS, len(self._signatures)):
+                self._compact()
+
+    # Document ids sharing at least one LSH band with the signature
+    def _candidates(self, signature: List[int]) -> set:
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            candidates.update(buckets.get(key, ()))
+        return candidates
+
+    def _insert(self, doc_id: str, signature: List[int], scope: str, offset: int, created_at: float):
+        self._signatures[doc_id] = (signature, scope, offset, created_at)
+        for band, buckets in enumerate(self._buckets):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            buckets.setdefault(key, []).append(doc_id)
+
+    def _remove(self, doc_id: str):
+        signature = self._signatures.pop(doc_id)[0]
+        for band, buckets in enumerate(self._buckets):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            ids = buckets.get(key)
+            if ids is not None:
+                ids.remove(doc_id)
+                if not ids:
+                    del buckets[key]
+        self._dead += 1
+
+    # Drop expired entries and, past max_entries, the oldest ones
+    # Caller holds self._lock
+    def _evict(self):
+        # Entries are roughly in creation order, so expired ones are at the front
+        oldest = time.time() - self.ttl_seconds
+        while self._signatures:
+            doc_id = next(iter(self._signatures))
+            if self._signatures[doc_id][3] >= oldest:
+                break
+            self._remove(doc_id)
+
+        if len(self._signatures) > self.max_entries:
+            # Trim to 90% so the sort is paid once per max_entries / 10 additions
+            by_age = sorted(self._signatures, key=lambda doc_id: self._signatures[doc_id][3])
+            for doc_id in by_age[:len(by_age) - int(self.max_entries * 0.9)]:
+                self._remove(doc_id)
+
+    def _read_record(self, offset: int) -> Optional[Dict]:
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+    # Rebuild the in-memory signatures and buckets from the index file
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._reload()
+            self._loaded = True
+            if self._dead >= max(COMPACT_MIN_DEAD_RECORDS, len(self._signatures)):
+                self._compact()
+
+    # Index records other processes appended since we last read the file, or reload it
+    # when another process has compacted it
+    def _refresh(self):
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return
+        if self._identity(stat) == self._file_id and stat.st_size <= self._loaded_size:
+            return
+        with self._lock:
+            self._refresh_locked()
+
+    @staticmethod
+    def _identity(stat) -> tuple:
+        return stat.st_dev, stat.st_ino
+
+    # Caller holds self._lock
+    def _reload(self):
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._loaded_size = 0
+        self._dead = 0
+        try:
+            self._file_id = self._identity(os.stat(self.index_file))
+        except OSError:
+            self._file_id = None
+        self._read_from(0)
+
+    # Caller holds self._lock
+    def _read_from(self, offset: int):
+        oldest = time.time() - self.ttl_seconds
+        try:
+            with open(self.index_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    # Stop at a line still being written; it is read again next time
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = {}
+                    existing = self._signatures.get(record.get('id'))
+                    if existing is not None and existing[2] == offset:
+                        pass  # our own append
+                    elif existing is None and len(record.get('signature', ())) == self.num_bins and \
+                            record.get('created_at', 0) >= oldest:
+                        self._insert(record['id'], record['signature'], record.get('scope', ''), offset,
+                                     record['created_at'])
+                    else:
+                        self._dead += 1
+                    offset += len(line)
+        except OSError:
+            pass
+        self._loaded_size = max(self._loaded_size, offset)
+        self._evict()
+
+    # Rewrite the index file with only the live records and swap it in
+    # Caller holds self._lock
+    def _compact(self):
+        temp_file = f"{self.index_file}.tmp"
+        try:
+            with file_lock(self.index_file):
+                # Pick up anything other processes appended before we rewrite
+                self._refresh_locked()
+                live = sorted(self._signatures.items(), key=lambda item: item[1][2])
+                with open(self.index_file, 'rb') as source, open(temp_file, 'wb') as target:
+                    for _, (_, _, offset, _) in live:
+                        source.seek(offset)
+                        target.write(source.readline())
+                    target.flush()
+                    os.fsync(target.fileno())
+                os.replace(temp_file, self.index_file)
+        except OSError as e:
+            print(f"Error compacting similarity index: {e}")
+            return
+        metrics.increment("similarity_compactions_total")
+        self._reload()
+
+    # _refresh for a caller that already holds self._lock
+    def _refresh_locked(self):
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return
+        if self._identity(stat) != self._file_id or stat.st_size < self._loaded_size:
+            self._reload()
+        elif stat.st_size > self._loaded_size:
+            self._read_from(self._loaded_size)
+
+similarity_index = SimilarityIndex()
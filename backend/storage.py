@@ -0,0 +1,184 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Optional, List, Dict
+
+# Columns returned by list queries - everything except the summary body
+LIST_COLUMNS = "seq, id, timestamp, document_name, terms_looked_up, tokens_used, input_length"
+FULL_COLUMNS = LIST_COLUMNS + ", summary"
+
+# Embedded SQLite store for saved summaries
+class SummaryRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._closed = False
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    document_name TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    terms_looked_up TEXT NOT NULL,
+                    tokens_used INTEGER,
+                    input_length INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_id ON summaries(id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_timestamp ON summaries(timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_document_name ON summaries(document_name, seq)")
+
+    # Insert one summary record
+    def add(self, record: Dict):
+        self.add_many([record])
+
+    # Insert several summary records in one transaction
+    def add_many(self, records: List[Dict]):
+        rows = [
+            (
+                r['id'], r['timestamp'], r['document_name'], r['summary'],
+                json.dumps(r.get('terms_looked_up', [])), r.get('tokens_used'), r['input_length'],
+            )
+            for r in records
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO summaries (id, timestamp, document_name, summary, terms_looked_up, tokens_used, input_length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    # Queue a summary record for a background thread to insert, so a request handler on
+    # the event loop doesn't wait on the SQLite commit; reads flush the queue first
+    def add_later(self, record: Dict):
+        if self._closed:
+            self.add(record)
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run_writer, name="summary-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(record)
+
+    # Block until every queued record has been inserted
+    def flush(self):
+        if self._writer is not None and not self._closed:
+            self._queue.join()
+
+    def _run_writer(self):
+        while True:
+            records = [self._queue.get()]
+            # Insert everything else already waiting in the same transaction
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in records
+            try:
+                self.add_many([record for record in records if record is not None])
+            except Exception as e:
+                print(f"Error saving summaries: {e}")
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def count(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    # Fetch one full record by summary ID (newest if the ID was reused)
+    def get(self, summary_id: str) -> Optional[Dict]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {FULL_COLUMNS} FROM summaries WHERE id = ? ORDER BY seq DESC LIMIT 1",
+                (summary_id,),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    # List summaries newest first without the summary body
+    # Returns: (records, next_cursor) - pass next_cursor back to get the following page
+    def list(self, limit: int = 20, cursor: Optional[str] = None, start: Optional[str] = None,
+             end: Optional[str] = None, document_name: Optional[str] = None) -> tuple[List[Dict], Optional[str]]:
+        clauses = []
+        params = []
+        if cursor:
+            clauses.append("seq < ?")
+            params.append(int(cursor))
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if document_name:
+            clauses.append("document_name = ?")
+            params.append(document_name)
+
+        self.flush()
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Fetch one extra row to know whether another page exists
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {LIST_COLUMNS} FROM summaries {where} ORDER BY seq DESC LIMIT ?",
+                params,
+            ).fetchall()
+
+        records = [self._to_dict(row) for row in rows[:limit]]
+        next_cursor = str(rows[limit - 1]['seq']) if len(rows) > limit else None
+        return records, next_cursor
+
+    # Every full record, oldest first
+    def all(self) -> List[Dict]:
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {FULL_COLUMNS} FROM summaries ORDER BY seq").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    # Insert anything still queued, then close the connection
+    def close(self):
+        # Records queued after this point are inserted inline
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            # A record queued while close() was starting can land behind the sentinel
+            leftover = []
+            while True:
+                try:
+                    leftover.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            leftover = [record for record in leftover if record is not None]
+            if leftover:
+                self.add_many(leftover)
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        record.pop('seq', None)
+        record['terms_looked_up'] = json.loads(record['terms_looked_up'])
+        return record
@@ -1,67 +1,384 @@
+import atexit
 import json
 import os
+import queue
+import re
+import threading
+import time
+import uuid
 from datetime import datetime
 from .config import config
+from .locks import file_lock
 from .models import LogEntry, Summary
+from .storage import SummaryRepository
+from .metrics import metrics
+
+# Path of the append-only NDJSON file that replaces a legacy JSON array file
+def ndjson_path(json_file: str) -> str:
+    return os.path.splitext(json_file)[0] + '.ndjson'
+
+# A date-only end bound ("2024-01-15") covers that whole day
+def inclusive_end(end: str) -> str:
+    if end and re.fullmatch(r'\d{4}-\d{2}-\d{2}', end):
+        return end + 'T23:59:59.999999'
+    return end
+
+# Read every record from an NDJSON file, skipping a torn final line
+def read_ndjson(path: str) -> list:
+    records = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+# Background thread that batches records and appends them to NDJSON files
+# Each batch is appended under a file lock, so several server processes can share a file
+class NDJSONWriter:
+    def __init__(self, max_queue: int, flush_interval: float, fsync_interval: float):
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._files = {}
+        self._file_lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    # Queue a record for writing; falls back to an inline write when the queue is full
+    def write(self, path: str, record: dict):
+        line = json.dumps(record) + '\n'
+        if self._closed:
+            self._write_batch({path: [line]})
+            return
+        try:
+            self._queue.put_nowait((path, line))
+        except queue.Full:
+            self._write_batch({path: [line]})
+
+    # Block until everything queued so far has been written
+    def flush(self):
+        if not self._closed:
+            self._queue.join()
+
+    # Drain the queue, fsync and stop the writer thread
+    def close(self):
+        if self._closed:
+            return
+        # From here on write() appends inline, so nothing new lands behind the sentinel
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+        # A write() that raced with close() may still have queued a record after the sentinel
+        batch = {}
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                path, line = entry
+                batch.setdefault(path, []).append(line)
+        if batch:
+            self._write_batch(batch)
+
+        with self._file_lock:
+            for f in self._files.values():
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+            self._files = {}
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+
+            # Collect everything else already waiting into one batch
+            items = [item]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = {}
+            stop = False
+            for entry in items:
+                if entry is None:
+                    stop = True
+                    continue
+                path, line = entry
+                batch.setdefault(path, []).append(line)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Error writing telemetry batch: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+            self._maybe_fsync()
+            if stop:
+                return
+
+    def _write_batch(self, batch: dict):
+        with self._file_lock:
+            for path, lines in batch.items():
+                f = self._files.get(path)
+                if f is None:
+                    f = open(path, 'a')
+                    self._files[path] = f
+                with file_lock(path):
+                    f.write(''.join(lines))
+                    f.flush()
+
+    # Periodically force appended data to disk
+    def _maybe_fsync(self):
+        if time.monotonic() - self._last_fsync < self.fsync_interval:
+            return
+        with self._file_lock:
+            for f in self._files.values():
+                os.fsync(f.fileno())
+        self._last_fsync = time.monotonic()
 
 # Handles logging of requests and saving summaries
+# Data files, the writer thread and the summary store are set up on first use, not at import
 class TelemetryLogger:
     def __init__(self):
-        self.log_file = config.LOG_FILE
-        self.summaries_file = config.SUMMARIES_FILE
+        self.storage = config.TELEMETRY_STORAGE
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._writer = None
+        self.summary_store = None
+
+        if self.storage == "ndjson":
+            self.log_file = ndjson_path(config.LOG_FILE)
+            self.summaries_file = ndjson_path(config.SUMMARIES_FILE)
+        else:
+            self.log_file = config.LOG_FILE
+            self.summaries_file = config.SUMMARIES_FILE
+
+    # Set up storage; called on first use, or at server startup to keep it off the first request
+    def start(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                self._start()
+                self._started = True
+
+    def _start(self):
         self._ensure_files_exist()
+        if self.storage == "ndjson":
+            self._migrate_json(config.LOG_FILE, self.log_file)
+            self._migrate_json(config.SUMMARIES_FILE, self.summaries_file)
+            self._writer = NDJSONWriter(
+                config.TELEMETRY_QUEUE_SIZE,
+                config.TELEMETRY_FLUSH_INTERVAL,
+                config.TELEMETRY_FSYNC_INTERVAL,
+            )
+
+        # Summaries live in SQLite so they can be listed and filtered without a full scan
+        if config.SUMMARY_STORAGE == "sqlite":
+            self.summary_store = SummaryRepository(config.SUMMARIES_DB)
+            self._migrate_summaries_to_store()
+
+        # Write out whatever the background writers still have queued
+        atexit.register(self.close)
 
     # Create data files if they don't exist
     def _ensure_files_exist(self):
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-        
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w') as f:
-                json.dump([], f)
-        
-        if not os.path.exists(self.summaries_file):
-            with open(self.summaries_file, 'w') as f:
-                json.dump([], f)
-
-    # Append a log entry to logs.json
+        os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+
+        for path in (self.log_file, self.summaries_file):
+            # Other server processes may be creating the same file
+            with file_lock(path):
+                if not os.path.exists(path):
+                    with open(path, 'w') as f:
+                        if self.storage != "ndjson":
+                            json.dump([], f)
+
+    # One-time conversion of a legacy JSON array file to NDJSON
+    # Runs only while the NDJSON file is still empty; the legacy file is left in place
+    def _migrate_json(self, json_file: str, target: str):
+        with file_lock(target):
+            self._migrate_json_locked(json_file, target)
+
+    def _migrate_json_locked(self, json_file: str, target: str):
+        if not os.path.exists(json_file) or os.path.getsize(target) > 0:
+            return
+
+        try:
+            with open(json_file, 'r') as f:
+                content = f.read().strip()
+            records = json.loads(content) if content else []
+        except Exception as e:
+            print(f"Error migrating {json_file}: {e}")
+            return
+
+        if not records:
+            return
+
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        os.replace(tmp_path, target)
+        print(f"Migrated {len(records)} records from {json_file} to {target}")
+
+    # One-time import of file-based summaries into an empty summary store
+    # Held under a file lock so only one of several starting workers does the import
+    def _migrate_summaries_to_store(self):
+        with file_lock(config.SUMMARIES_DB):
+            if self.summary_store.count() > 0:
+                return
+
+            records = self._read_summaries_file()
+            if records:
+                self.summary_store.add_many(records)
+                print(f"Imported {len(records)} summaries into {config.SUMMARIES_DB}")
+
+    def _read_summaries_file(self) -> list:
+        if self.storage == "ndjson":
+            if self._writer is not None:
+                self._writer.flush()
+            return read_ndjson(self.summaries_file)
+
+        try:
+            with open(self.summaries_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading summaries: {e}")
+            return []
+
+    # Append a log entry to the log file
     def log_request(self, log_entry: LogEntry):
+        self.start()
+        with metrics.span("log_request"):
+            self._log_request(log_entry)
+
+    def _log_request(self, log_entry: LogEntry):
+        if self._writer is not None:
+            self._writer.write(self.log_file, log_entry.dict())
+            return
+
         try:
-            with open(self.log_file, 'r') as f:
-                logs = json.load(f)
-            
-            logs.append(log_entry.dict())
-            
-            with open(self.log_file, 'w') as f:
-                json.dump(logs, f, indent=2)
+            with self._lock, file_lock(self.log_file):
+                with open(self.log_file, 'r') as f:
+                    logs = json.load(f)
+
+                logs.append(log_entry.dict())
+
+                with open(self.log_file, 'w') as f:
+                    json.dump(logs, f, indent=2)
         except Exception as e:
             print(f"Error logging request: {e}")
 
-    # Save a document summary to summaries.json
+    # Save a document summary to the summaries file
     def save_summary(self, summary: Summary):
+        self.start()
+        with metrics.span("save_summary"):
+            self._save_summary(summary)
+
+    def _save_summary(self, summary: Summary):
+        if self.summary_store is not None:
+            try:
+                self.summary_store.add_later(summary.dict())
+            except Exception as e:
+                print(f"Error saving summary: {e}")
+            return
+
+        if self._writer is not None:
+            self._writer.write(self.summaries_file, summary.dict())
+            return
+
         try:
-            with open(self.summaries_file, 'r') as f:
-                summaries = json.load(f)
-            
-            summaries.append(summary.dict())
-            
-            with open(self.summaries_file, 'w') as f:
-                json.dump(summaries, f, indent=2)
+            with self._lock, file_lock(self.summaries_file):
+                with open(self.summaries_file, 'r') as f:
+                    summaries = json.load(f)
+
+                summaries.append(summary.dict())
+
+                with open(self.summaries_file, 'w') as f:
+                    json.dump(summaries, f, indent=2)
         except Exception as e:
             print(f"Error saving summary: {e}")
 
     # Retrieve all saved summaries
     def get_all_summaries(self):
-        try:
-            with open(self.summaries_file, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error reading summaries: {e}")
-            return []
-        
+        self.start()
+        if self.summary_store is not None:
+            return self.summary_store.all()
+
+        # Make sure summaries still sitting in the writer queue are visible
+        return self._read_summaries_file()
+
+    # List summaries newest first without the summary body
+    # Returns: (summaries, next_cursor)
+    def list_summaries(self, limit: int = 20, cursor: str = None, start: str = None,
+                       end: str = None, document_name: str = None):
+        self.start()
+        end = inclusive_end(end)
+        if self.summary_store is not None:
+            return self.summary_store.list(limit, cursor, start, end, document_name)
+
+        # File storage: filter in memory, cursor is an offset into the newest-first list
+        records = [
+            r for r in reversed(self.get_all_summaries())
+            if (not start or r['timestamp'] >= start)
+            and (not end or r['timestamp'] <= end)
+            and (not document_name or r['document_name'] == document_name)
+        ]
+        offset = int(cursor) if cursor else 0
+        page = [{k: v for k, v in r.items() if k != 'summary'} for r in records[offset:offset + limit]]
+        next_cursor = str(offset + limit) if offset + limit < len(records) else None
+        return page, next_cursor
+
+    # Fetch one full summary by ID
+    def get_summary(self, summary_id: str):
+        self.start()
+        if self.summary_store is not None:
+            return self.summary_store.get(summary_id)
+
+        for record in reversed(self.get_all_summaries()):
+            if record['id'] == summary_id:
+                return record
+        return None
+
+    # Flush pending records and stop the background writer
+    # The next use (or a server restart in the same process) sets storage up again
+    def close(self):
+        with self._start_lock:
+            self._started = False
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self.summary_store is not None:
+                self.summary_store.close()
+                self.summary_store = None
+            atexit.unregister(self.close)
+
     # Generate a unique ID for a summary
+    # The random suffix keeps IDs unique across requests finishing in the same second,
+    # including ones handled by other server processes
     def generate_summary_id(self) -> str:
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"sum_{timestamp}"
+        return f"sum_{timestamp}_{uuid.uuid4().hex[:8]}"
 
-telemetry_logger = TelemetryLogger()
\ No newline at end of file
+telemetry_logger = TelemetryLogger()
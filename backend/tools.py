@@ -1,5 +1,364 @@
-import requests
-from typing import Optional, Dict
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, List, Tuple
+from .config import config
+from .glossary import legal_glossary, lemmatize, tokenize, term_key
+from .metrics import metrics
+from .locks import file_lock
+
+# Marks a cached "no definition" result so misses are not re-queried
+_MISSING = object()
+
+# The cache log is rewritten without superseded and long-expired entries once they
+# outnumber the live ones (and there are at least this many)
+COMPACT_MIN_DEAD_RECORDS = 200
+
+# Shared, disk-persisted cache of term definitions with negative caching
+# Entries are appended to an NDJSON log under a file lock, so concurrent writers (other
+# server processes) never overwrite each other; the line valid longest wins, and entries
+# other processes append are picked up on the next miss. The log is compacted (rewritten
+# and replaced) once dead lines outnumber live ones, and processes that see it replaced reload
+# The file is read on first use rather than at import
+class DefinitionCache:
+    def __init__(self):
+        self.legacy_file = config.DEFINITION_CACHE_FILE
+        self.cache_file = os.path.splitext(config.DEFINITION_CACHE_FILE)[0] + '.ndjson'
+        self.ttl_seconds = config.DEFINITION_CACHE_TTL_SECONDS
+        self.negative_ttl_seconds = config.DEFINITION_NEGATIVE_TTL_SECONDS
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_size = 0
+        self._file_id = None
+        # Lines in the log that are not in _entries (superseded, long expired, unreadable)
+        self._dead = 0
+
+    # Return the cached result, _MISSING for a cached miss, or None if not cached (or expired)
+    def get(self, term: str):
+        self._ensure_loaded()
+        entry = self._live_entry(term)
+        if entry is None:
+            # Another process may have looked it up since
+            self._refresh()
+            entry = self._live_entry(term)
+        if entry is None:
+            return None
+        return entry['result'] if entry['result'] is not None else _MISSING
+
+    # Cache a definition, or a miss when result is None
+    def put(self, term: str, result: Optional[Dict]):
+        ttl = self.ttl_seconds if result is not None else self.negative_ttl_seconds
+        entry = {'result': result, 'expires_at': time.time() + ttl}
+        line = (json.dumps({'term': term, **entry}) + '\n').encode('utf-8')
+        self._ensure_loaded()
+        with self._lock:
+            try:
+                with file_lock(self.cache_file), open(self.cache_file, 'ab') as f:
+                    offset = f.tell()
+                    f.write(line)
+                    file_id = self._identity(os.fstat(f.fileno()))
+            except OSError as e:
+                print(f"Error saving definition cache: {e}")
+                self._entries[term] = entry
+                return
+            if file_id != self._file_id:
+                # Another process compacted the log - read it again, including our line
+                self._reload()
+            else:
+                self._set(term, entry)
+                if offset == self._loaded_size:
+                    self._loaded_size = offset + len(line)
+            if self._dead >= max(COMPACT_MIN_DEAD_RECORDS, len(self._entries)):
+                self._compact()
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    # Terms looked up before whose cached result has expired - the next lookup goes to the network
+    # Expired entries are kept for another TTL so they can be refreshed ahead of time
+    def expired_terms(self) -> List[str]:
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            return [term for term, entry in self._entries.items() if entry['expires_at'] < now]
+
+    def _live_entry(self, term: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(term)
+        if entry is None or entry['expires_at'] < time.time():
+            return None
+        return entry
+
+    # Entries still worth keeping: unexpired, or expired for less than one TTL
+    def _retained(self, entry: Dict, now: float) -> bool:
+        return entry.get('expires_at', 0) + self.ttl_seconds >= now
+
+    # Caller holds self._lock
+    def _set(self, term: str, entry: Dict):
+        if term in self._entries:
+            self._dead += 1
+        self._entries[term] = entry
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._migrate_legacy()
+                self._reload()
+                self._loaded = True
+
+    @staticmethod
+    def _identity(stat) -> tuple:
+        return stat.st_dev, stat.st_ino
+
+    # One-time conversion of a JSON cache file from before the log; the old file is left in place
+    # Caller holds self._lock
+    def _migrate_legacy(self):
+        if not os.path.exists(self.legacy_file) or self.legacy_file == self.cache_file:
+            return
+        try:
+            with file_lock(self.cache_file):
+                if os.path.exists(self.cache_file) and os.path.getsize(self.cache_file) > 0:
+                    return
+                with open(self.legacy_file, 'r') as f:
+                    entries = json.load(f)
+                with open(self.cache_file, 'a') as f:
+                    for term, entry in entries.items():
+                        f.write(json.dumps({'term': term, **entry}) + '\n')
+        except (OSError, ValueError) as e:
+            print(f"Error migrating definition cache: {e}")
+
+    # Caller holds self._lock
+    def _reload(self):
+        self._entries = {}
+        self._loaded_size = 0
+        self._dead = 0
+        try:
+            self._file_id = self._identity(os.stat(self.cache_file))
+        except OSError:
+            self._file_id = None
+        self._read_from(0)
+
+    # Read entries appended since the last read, or reload the log if it was replaced
+    def _refresh(self):
+        try:
+            stat = os.stat(self.cache_file)
+        except OSError:
+            return
+        if self._identity(stat) == self._file_id and stat.st_size <= self._loaded_size:
+            return
+        with self._lock:
+            self._refresh_locked()
+
+    # _refresh for a caller that already holds self._lock
+    def _refresh_locked(self):
+        try:
+            stat = os.stat(self.cache_file)
+        except OSError:
+            return
+        if self._identity(stat) != self._file_id or stat.st_size < self._loaded_size:
+            self._reload()
+        elif stat.st_size > self._loaded_size:
+            self._read_from(self._loaded_size)
+
+    # Caller holds self._lock
+    def _read_from(self, offset: int):
+        now = time.time()
+        try:
+            with open(self.cache_file, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    # Stop at a line still being written; it is read again next time
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                        term = record['term']
+                        entry = {'result': record['result'], 'expires_at': record['expires_at']}
+                    except (ValueError, KeyError, TypeError):
+                        self._dead += 1
+                        continue
+                    existing = self._entries.get(term)
+                    # Lines from several processes can interleave - keep the most recent lookup
+                    if not self._retained(entry, now) or \
+                            (existing is not None and existing['expires_at'] > entry['expires_at']):
+                        self._dead += 1
+                    else:
+                        self._set(term, entry)
+        except OSError:
+            pass
+        self._loaded_size = max(self._loaded_size, offset)
+
+    # Rewrite the log with one line per retained entry and swap it in
+    # Caller holds self._lock
+    def _compact(self):
+        temp_file = f"{self.cache_file}.tmp"
+        try:
+            with file_lock(self.cache_file):
+                # Pick up anything other processes appended before we rewrite
+                self._refresh_locked()
+                now = time.time()
+                with open(temp_file, 'w') as f:
+                    for term, entry in self._entries.items():
+                        if self._retained(entry, now):
+                            f.write(json.dumps({'term': term, **entry}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            print(f"Error compacting definition cache: {e}")
+            return
+        self._reload()
+
+definition_cache = DefinitionCache()
+
+# Keep-alive HTTP session and worker threads for dictionary lookups, created on first use
+_http_lock = threading.Lock()
+_http_session = None
+_lookup_pool = None
+
+def _session():
+    global _http_session
+    if _http_session is None:
+        with _http_lock:
+            if _http_session is None:
+                import requests
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=config.DEFINITION_LOOKUP_CONCURRENCY
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+def _pool() -> ThreadPoolExecutor:
+    global _lookup_pool
+    if _lookup_pool is None:
+        with _http_lock:
+            if _lookup_pool is None:
+                _lookup_pool = ThreadPoolExecutor(
+                    max_workers=config.DEFINITION_LOOKUP_CONCURRENCY, thread_name_prefix="term-lookup"
+                )
+    return _lookup_pool
+
+# Run a blocking lookup on the bounded lookup pool, carrying the caller's context so its
+# spans are still recorded against the request
+def _submit(term: str) -> Future:
+    return _pool().submit(contextvars.copy_context().run, LegalTermLookup.lookup, term)
+
+# The first `limit` definitions in term order, given the lookups finished so far
+# Returns: (selected, settled) - settled once no unfinished lookup could change the selection
+def _select_in_order(terms: List[str], finished: Dict[int, Optional[Dict]], limit: int) -> Tuple[List, bool]:
+    selected = []
+    for index, term in enumerate(terms):
+        if len(selected) >= limit:
+            return selected, True
+        if index not in finished:
+            return selected, False
+        if finished[index]:
+            selected.append((term, finished[index]))
+    return selected, True
+
+# Best selection at the deadline: skip lookups that never answered
+def _select_finished(terms: List[str], finished: Dict[int, Optional[Dict]], limit: int) -> List:
+    return [(term, finished[i]) for i, term in enumerate(terms) if finished.get(i)][:limit]
+
+# Terms worth looking up before the model answers: terms earlier documents flagged whose
+# cached definition has expired and that appear in the text. Glossary terms and terms still
+# cached are answered without a network call, so prefetching them would save nothing
+def prefetch_candidates(text: str, limit: int) -> List[str]:
+    if not config.DEFINITION_REMOTE_FALLBACK:
+        return []
+    expired = {term_key(term): term for term in definition_cache.expired_terms()}
+    if not expired:
+        return []
+
+    terms = []
+    seen = set()
+    longest = max(len(key.split(' ')) for key in expired)
+    words = [lemmatize(word) for word in tokenize(text)]
+    for i in range(len(words)):
+        for length in range(1, longest + 1):
+            key = ' '.join(words[i:i + length])
+            if key in expired and key not in seen:
+                seen.add(key)
+                terms.append(expired[key])
+                if len(terms) >= limit:
+                    return terms
+    return terms
+
+# Whether looking the term up now would go to the network: remote lookups are on and the term
+# is neither in the glossary nor fresh in the definition cache
+def needs_remote_lookup(term: str) -> bool:
+    term = term.strip().lower()
+    if not config.DEFINITION_REMOTE_FALLBACK or legal_glossary.lookup(term):
+        return False
+    return term not in definition_cache
+
+# Speculative definition lookups for one analysis, started from the document text so their
+# network round trips overlap the model call; terms the model lists later reuse these lookups
+class TermPrefetch:
+    def __init__(self, text: str):
+        self._lookups: Dict[str, asyncio.Task] = {}
+        self._durations: Dict[str, float] = {}
+        self._scan = asyncio.ensure_future(self._start(text))
+
+    async def _start(self, text: str):
+        terms = await asyncio.to_thread(prefetch_candidates, text, config.TERM_PREFETCH_MAX_TERMS)
+        for term in terms:
+            key = term_key(term)
+            if key not in self._lookups:
+                self._lookups[key] = asyncio.ensure_future(self._timed_lookup(key, term))
+
+    async def _timed_lookup(self, key: str, term: str) -> Optional[Dict]:
+        start = time.perf_counter()
+        result = await LegalTermLookup.lookup_async(term)
+        self._durations[key] = (time.perf_counter() - start) * 1000
+        return result
+
+    # Match the model's terms against the prefetched lookups and record hit rate and time saved
+    # Returns: {index into terms: prefetched lookup task}
+    async def reconcile(self, terms: List[str]) -> Dict[int, asyncio.Task]:
+        try:
+            await self._scan
+        except Exception:
+            return {}
+
+        matched = {}
+        saved_ms = 0.0
+        unmatched = []
+        for index, term in enumerate(terms):
+            key = term_key(term)
+            task = self._lookups.get(key)
+            if task is None:
+                unmatched.append(term)
+                continue
+            metrics.increment("term_prefetch_total", result="hit")
+            matched[index] = task
+            # Lookups already finished cost nothing now; they ran while the model was working
+            if task.done() and key in self._durations:
+                saved_ms = max(saved_ms, self._durations[key])
+        # Glossary terms and fresh cache hits never needed prefetching, so they aren't misses
+        if unmatched:
+            remote = await asyncio.to_thread(lambda: [term for term in unmatched if needs_remote_lookup(term)])
+            if remote:
+                metrics.increment("term_prefetch_total", len(remote), result="miss")
+        metrics.observe("term_prefetch_saved_ms", saved_ms)
+        return matched
+
+    # Cancel lookups nobody asked for
+    def close(self):
+        self._scan.cancel()
+        for task in self._lookups.values():
+            task.cancel()
 
 class LegalTermLookup:
     # API tool to look up defenitions of complex legal terms
@@ -8,14 +367,125 @@ class LegalTermLookup:
         # Clean the term
         term = term.strip().lower()
 
+        # Bundled glossary first - no network needed
+        result = legal_glossary.lookup(term)
+        if result:
+            metrics.increment("definition_lookups_total", source="glossary")
+            return result
+
+        if not config.DEFINITION_REMOTE_FALLBACK:
+            metrics.increment("definition_lookups_total", source="miss")
+            return None
+
+        cached = definition_cache.get(term)
+        if cached is not None:
+            metrics.increment("definition_lookups_total", source="cache")
+            return None if cached is _MISSING else cached
+
+        metrics.increment("definition_lookups_total", source="http")
+        # Only needed for remote lookups, so it stays out of the import path
+        import requests
+
         # Try dictionary API
-        url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{term}"
-        response = requests.get(url, timeout=5)
+        url = f"{config.DICTIONARY_API_URL}/{term}"
+        try:
+            with metrics.span("legal_term_lookup"):
+                response = _session().get(url, timeout=config.DEFINITION_LOOKUP_DEADLINE)
+        except requests.RequestException:
+            # Transient network failure - don't cache, try again next time
+            return None
 
+        if response.status_code == 404:
+            definition_cache.put(term, None)
+            return None
         if response.status_code != 200:
             return None
 
-        data = response.json()
+        result = LegalTermLookup._parse_entry(term, response.json())
+        definition_cache.put(term, result)
+        return result
+
+    # Async lookup so the event loop is not blocked by the HTTP round trip
+    @staticmethod
+    async def lookup_async(term: str) -> Optional[Dict]:
+        # Glossary hits are answered inline - only remote lookups need a thread
+        result = legal_glossary.lookup(term.strip().lower())
+        if result:
+            metrics.increment("definition_lookups_total", source="glossary")
+            return result
+        return await asyncio.wrap_future(_submit(term))
+
+    # Look up several terms at once and keep the first `limit` definitions in term order
+    # Lookups run concurrently on the bounded lookup pool under one overall deadline, so the
+    # wait is about one round trip instead of one per term. Once the selection is settled
+    # (or the deadline passes) lookups still queued for a thread are cancelled; requests
+    # already in flight can't be interrupted and finish in the background, within the HTTP
+    # timeout, still filling the definition cache
+    # Returns: [(term, result)]
+    @staticmethod
+    def lookup_many(terms: List[str], limit: int) -> List[Tuple[str, Dict]]:
+        if not terms:
+            return []
+        deadline = time.monotonic() + config.DEFINITION_LOOKUP_DEADLINE
+        futures = {_submit(term): i for i, term in enumerate(terms)}
+        finished = {}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+                if not done:
+                    metrics.increment("definition_lookup_deadline_exceeded_total")
+                    return _select_finished(terms, finished, limit)
+                for future in done:
+                    finished[futures[future]] = future.result() if future.exception() is None else None
+                selected, settled = _select_in_order(terms, finished, limit)
+                if settled:
+                    return selected
+            return _select_finished(terms, finished, limit)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    # Async version of lookup_many, on the same pool and with the same cancellation limits;
+    # terms already fetched by a TermPrefetch reuse its lookups
+    @staticmethod
+    async def lookup_many_async(terms: List[str], limit: int,
+                                prefetch: Optional[TermPrefetch] = None) -> List[Tuple[str, Dict]]:
+        if not terms:
+            return []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.DEFINITION_LOOKUP_DEADLINE
+        prefetched = await prefetch.reconcile(terms) if prefetch is not None else {}
+        tasks = {}
+        for i, term in enumerate(terms):
+            task = prefetched.get(i)
+            # Two spellings of one term share a prefetched lookup - the second gets its own
+            if task is None or task in tasks:
+                task = asyncio.ensure_future(LegalTermLookup.lookup_async(term))
+            tasks[task] = i
+        finished = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    metrics.increment("definition_lookup_deadline_exceeded_total")
+                    return _select_finished(terms, finished, limit)
+                for task in done:
+                    finished[tasks[task]] = task.result() if task.exception() is None else None
+                selected, settled = _select_in_order(terms, finished, limit)
+                if settled:
+                    return selected
+            return _select_finished(terms, finished, limit)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # Pull the first definition out of a dictionary API response
+    @staticmethod
+    def _parse_entry(term: str, data) -> Optional[Dict]:
         if not data:
             return None
 
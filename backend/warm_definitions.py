@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Preload the legal term definition cache from past summaries
+#
+# Usage: python -m backend.warm_definitions
+from concurrent.futures import ThreadPoolExecutor
+from .config import config
+from .glossary import legal_glossary
+from .telemetry import telemetry_logger
+from .tools import legal_term_lookup, definition_cache
+
+# Unique terms from terms_looked_up across saved summaries
+def collect_terms():
+    terms = []
+    seen = set()
+    for summary in telemetry_logger.get_all_summaries():
+        for term in summary.get('terms_looked_up', []):
+            term = term.strip().lower()
+            if term and term not in seen:
+                seen.add(term)
+                terms.append(term)
+    return terms
+
+def main():
+    terms = collect_terms()
+    # Glossary terms are answered locally and never stored in the cache
+    glossary_terms = [term for term in terms if legal_glossary.lookup(term)]
+    remote_terms = [term for term in terms if not legal_glossary.lookup(term)]
+    pending = [term for term in remote_terms if term not in definition_cache]
+
+    print(f"Found {len(terms)} unique terms in past summaries")
+    print(f"In the glossary: {len(glossary_terms)}")
+    print(f"Already cached: {len(remote_terms) - len(pending)}")
+
+    if not pending:
+        print("Definition cache is warm")
+        return
+    if not config.DEFINITION_REMOTE_FALLBACK:
+        print(f"Skipping {len(pending)} terms: DEFINITION_REMOTE_FALLBACK is off")
+        return
+
+    print(f"Looking up {len(pending)} terms...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(legal_term_lookup.lookup, pending))
+
+    found = sum(1 for result in results if result)
+    # Lookups that failed (network errors, unexpected responses) are not cached
+    failed = sum(1 for term in pending if term not in definition_cache)
+    print(f"Cached {found} definitions and {len(pending) - found - failed} misses")
+    if failed:
+        print(f"{failed} lookups failed and were not cached")
+
+if __name__ == "__main__":
+    main()
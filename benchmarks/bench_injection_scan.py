@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: injection pattern scanning
+Compares the old per-pattern substring loop with the compiled matcher
+(windowed, whitespace/unicode tolerant) while scaling both the number of
+patterns and the input size
+"""
+import sys
+import os
+import random
+import string
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.config import Config
+from backend.safety import _compile_patterns, _scan
+
+
+def legacy_scan(text, patterns):
+    """The original detect_injection: lowercase copy, then one scan per pattern"""
+    text_lower = text.lower()
+    for pattern in patterns:
+        if pattern in text_lower:
+            return True
+    return False
+
+
+def compiled_scan(text, patterns):
+    """The compiled matcher (as used by SafetyChecker.find_injection)"""
+    return bool(_scan(text, tuple(patterns), first_only=True))
+
+
+def make_patterns(count):
+    """Real patterns padded with random multi-word phrases"""
+    rng = random.Random(42)
+    patterns = list(Config.INJECTION_PATTERNS)
+    while len(patterns) < count:
+        words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(rng.randint(2, 4))]
+        patterns.append(' '.join(words))
+    return patterns[:count]
+
+
+def make_document(size):
+    """Clean contract-like text built from the sample documents"""
+    with open('sample_data/nda_sample.txt', 'r') as f:
+        base = f.read()
+    return (base * (size // len(base) + 1))[:size]
+
+
+def best_time(func, *args, repeat=5):
+    """Best of several runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patterns', type=int, nargs='+', default=[45, 200, 1000])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"\n{'patterns':>9} {'input':>9} {'legacy ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for count in args.patterns:
+        patterns = make_patterns(count)
+        compiled_scan("warm up", patterns)
+        for size in args.sizes:
+            # Clean text is the worst case: every pattern has to be ruled out
+            text = make_document(size)
+            legacy = best_time(legacy_scan, text, patterns)
+            compiled = best_time(compiled_scan, text, patterns)
+            print(f"{count:>9} {size:>9} {legacy:>11.2f} {compiled:>12.2f} {legacy / compiled:>7.1f}x")
+
+    start = time.perf_counter()
+    _compile_patterns.__wrapped__(tuple(make_patterns(1000)))
+    print(f"\nCompile time for 1000 patterns: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: server throughput and latency with local stand-ins for Gemini
+and the dictionary API, so it runs offline and gives repeatable numbers
+
+Starts the app with uvicorn on a local port, drives /api/analyze and
+/api/summaries at a fixed concurrency and reports requests/sec, latency
+percentiles and the server's per-stage breakdown. Results are saved as JSON;
+pass --compare with an earlier result file to see the difference.
+"""
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import requests
+
+# Terms the fake model "finds" - the first two are not in the glossary and go to the dictionary stub
+FAKE_TERMS = ["tortious interference", "blue pencil doctrine", "indemnification", "arbitration", "force majeure"]
+
+
+class FakeUsage:
+    """Token counts in the shape of a Gemini usage_metadata object"""
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = completion_tokens
+        self.total_token_count = prompt_tokens + completion_tokens
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini GenerateContentResponse"""
+    def __init__(self, text, usage):
+        self.text = text
+        self.parts = [text] if text else []
+        self.usage_metadata = usage
+
+
+class FakeStream:
+    """Async iterator of response chunks, as returned with stream=True"""
+    def __init__(self, model, text, usage):
+        self.model = model
+        self.text = text
+        self.usage = usage
+
+    async def __aiter__(self):
+        pieces = [self.text[i:i + 40] for i in range(0, len(self.text), 40)]
+        for piece in pieces:
+            await asyncio.sleep(self.model.latency() / len(pieces))
+            yield FakeResponse(piece, self.usage)
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel with configurable latency and token counts"""
+    def __init__(self, latency_ms, jitter, prompt_tokens, completion_tokens, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self):
+        """Seconds for one call: latency_ms +/- jitter (fraction)"""
+        with self._lock:
+            spread = self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency_ms * (1 + spread)) / 1000
+
+    def _response(self):
+        with self._lock:
+            self.calls += 1
+        terms = "\n".join(f"- {term}: explained in plain English" for term in FAKE_TERMS)
+        text = (
+            "Document Type: Service Agreement\n\n"
+            "Summary:\nThe parties agree to the services, payment terms and termination rights.\n\n"
+            f"Legal Terms Found:\n{terms}\n"
+        )
+        return text, FakeUsage(self.prompt_tokens, self.completion_tokens)
+
+    def generate_content(self, prompt, **kwargs):
+        text, usage = self._response()
+        time.sleep(self.latency())
+        return FakeResponse(text, usage)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        text, usage = self._response()
+        if stream:
+            return FakeStream(self, text, usage)
+        await asyncio.sleep(self.latency())
+        return FakeResponse(text, usage)
+
+
+class DictionaryStub:
+    """Local HTTP server answering like api.dictionaryapi.dev, with a fixed delay"""
+    def __init__(self, latency_ms):
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                stub.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency_ms / 1000)
+                word = requests.utils.unquote(self.path.rsplit('/', 1)[-1])
+                body = json.dumps([{
+                    'word': word,
+                    'meanings': [{'partOfSpeech': 'noun', 'definitions': [{'definition': f'Stub definition of {word}.'}]}],
+                }]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v2/entries/en"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(samples_ms):
+    """Summary statistics for a list of latencies in milliseconds"""
+    return {
+        'count': len(samples_ms),
+        'mean_ms': sum(samples_ms) / len(samples_ms) if samples_ms else 0.0,
+        'p50_ms': percentile(samples_ms, 50),
+        'p95_ms': percentile(samples_ms, 95),
+        'p99_ms': percentile(samples_ms, 99),
+        'max_ms': max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def configure_environment(args, data_dir, dictionary_url):
+    """Point every data file at a scratch directory before the backend is imported"""
+    os.environ.update({
+        'GEMINI_API_KEY': 'offline-benchmark',
+        'LOG_FILE': os.path.join(data_dir, 'logs.json'),
+        'SUMMARIES_FILE': os.path.join(data_dir, 'summaries.json'),
+        'SUMMARIES_DB': os.path.join(data_dir, 'summaries.db'),
+        'BATCHES_DB': os.path.join(data_dir, 'batches.db'),
+        'ANALYSIS_CACHE_DIR': os.path.join(data_dir, 'cache', 'analysis'),
+        'CLAUSE_CACHE_DIR': os.path.join(data_dir, 'cache', 'clauses'),
+        'ANALYSIS_CACHE_ENABLED': 'true' if args.cache else 'false',
+        'DEFINITION_CACHE_FILE': os.path.join(data_dir, 'cache', 'definitions.json'),
+        'SIMILARITY_INDEX_FILE': os.path.join(data_dir, 'similarity_index.ndjson'),
+        'DEFINITION_REMOTE_FALLBACK': 'true',
+        'DICTIONARY_API_URL': dictionary_url,
+        'GEMINI_RPM': str(args.rpm),
+        'GEMINI_TPM': str(args.tpm),
+    })
+
+
+def start_server(app, port):
+    """Run uvicorn in a background thread and wait until it accepts requests"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def load_documents():
+    """Sample documents used as request bodies (skipping any the safety check rejects)"""
+    from backend.safety import safety_checker
+
+    documents = []
+    for name in sorted(os.listdir('sample_data')):
+        with open(os.path.join('sample_data', name), 'r') as f:
+            text = f.read()
+        valid, error_msg = safety_checker.validate_input(text)
+        if not valid:
+            print(f"   Skipping {name}: {error_msg}")
+            continue
+        documents.append((name, text))
+    return documents
+
+
+def run_load(base_url, args, documents):
+    """Send args.requests requests from args.concurrency client threads"""
+    rng = random.Random(args.seed)
+    plan = []
+    for i in range(args.requests):
+        if rng.random() < args.summaries_ratio:
+            plan.append(('summaries', None))
+        else:
+            name, text = documents[i % len(documents)]
+            # A unique suffix defeats the analysis cache unless --repeat-documents is given
+            if not args.repeat_documents:
+                text = f"{text}\n\n[benchmark request {i}]"
+            plan.append(('analyze', {'text': text, 'document_name': name}))
+
+    local = threading.local()
+
+    def send(item):
+        endpoint, body = item
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        if endpoint == 'analyze':
+            response = session.post(f"{base_url}/api/analyze", json=body, timeout=120)
+        else:
+            response = session.get(f"{base_url}/api/summaries", params={'limit': 10}, timeout=120)
+        return endpoint, (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, plan))
+    elapsed = time.perf_counter() - start
+
+    by_endpoint = {}
+    errors = {}
+    for endpoint, latency_ms, status in results:
+        by_endpoint.setdefault(endpoint, []).append(latency_ms)
+        if status >= 400:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+
+    return {
+        'elapsed_s': elapsed,
+        'requests': len(results),
+        'requests_per_s': len(results) / elapsed if elapsed else 0.0,
+        'errors': errors,
+        'latency': latency_stats([latency for _, latency, _ in results]),
+        'endpoints': {endpoint: latency_stats(samples) for endpoint, samples in sorted(by_endpoint.items())},
+    }
+
+
+def stage_breakdown(snapshot):
+    """Per-stage latency from the server's metrics registry"""
+    stages = {}
+    for entry in snapshot['histograms'].get('stage_latency_ms', []):
+        stages[entry['labels']['stage']] = {
+            'count': entry['count'],
+            'mean_ms': entry['sum'] / entry['count'] if entry['count'] else 0.0,
+            'p50_ms': entry['quantiles']['0.5'],
+            'p95_ms': entry['quantiles']['0.95'],
+            'p99_ms': entry['quantiles']['0.99'],
+        }
+    return stages
+
+
+def print_report(result):
+    """Print a human-readable summary of one run"""
+    load = result['load']
+    print(f"\nRequests: {load['requests']} in {load['elapsed_s']:.2f}s "
+          f"-> {load['requests_per_s']:.1f} req/s (errors: {load['errors'] or 'none'})\n")
+
+    print(f"{'endpoint':<22}{'count':>8}{'mean':>11}{'p50':>11}{'p95':>11}{'p99':>11}")
+    rows = [('all', load['latency'])] + list(load['endpoints'].items())
+    for name, stats in rows:
+        print(f"{name:<22}{stats['count']:>8}{stats['mean_ms']:>9.1f}ms{stats['p50_ms']:>9.1f}ms"
+              f"{stats['p95_ms']:>9.1f}ms{stats['p99_ms']:>9.1f}ms")
+
+    print(f"\n{'stage':<22}{'count':>8}{'mean':>11}{'p50':>11}{'p95':>11}{'p99':>11}")
+    for name, stats in sorted(result['stages'].items()):
+        print(f"{name:<22}{stats['count']:>8}{stats['mean_ms']:>9.2f}ms{stats['p50_ms']:>9.2f}ms"
+              f"{stats['p95_ms']:>9.2f}ms{stats['p99_ms']:>9.2f}ms")
+
+    print(f"\nFake Gemini calls: {result['backends']['gemini_calls']}, "
+          f"dictionary stub requests: {result['backends']['dictionary_requests']} "
+          f"over {result['backends']['dictionary_connections']} connections")
+
+
+def print_comparison(result, baseline):
+    """Print throughput and latency changes relative to an earlier run"""
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {baseline.get('timestamp', 'baseline')}:")
+    new, old = result['load'], baseline['load']
+    print(f"   req/s: {old['requests_per_s']:.1f} -> {new['requests_per_s']:.1f} "
+          f"({change(new['requests_per_s'], old['requests_per_s'])})")
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        print(f"   {key}: {old['latency'][key]:.1f} -> {new['latency'][key]:.1f} "
+              f"({change(new['latency'][key], old['latency'][key])})")
+    for stage, stats in sorted(result['stages'].items()):
+        previous = baseline.get('stages', {}).get(stage)
+        if previous:
+            print(f"   stage {stage} p50: {previous['p50_ms']:.2f} -> {stats['p50_ms']:.2f}ms "
+                  f"({change(stats['p50_ms'], previous['p50_ms'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='total requests to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--summaries-ratio', type=float, default=0.2,
+                        help='fraction of requests that go to GET /api/summaries')
+    parser.add_argument('--gemini-latency-ms', type=float, default=800)
+    parser.add_argument('--gemini-jitter', type=float, default=0.25, help='latency spread as a fraction')
+    parser.add_argument('--prompt-tokens', type=int, default=1500)
+    parser.add_argument('--completion-tokens', type=int, default=400)
+    parser.add_argument('--dictionary-latency-ms', type=float, default=150)
+    parser.add_argument('--rpm', type=int, default=100000, help='Gemini requests per minute quota to simulate')
+    parser.add_argument('--tpm', type=int, default=10 ** 9, help='Gemini tokens per minute quota to simulate')
+    parser.add_argument('--cache', action='store_true', help='enable the analysis cache')
+    parser.add_argument('--repeat-documents', action='store_true',
+                        help='send the sample documents unchanged (cache hits with --cache)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load_<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='bench_load_')
+    dictionary = DictionaryStub(args.dictionary_latency_ms)
+    configure_environment(args, data_dir, dictionary.url)
+
+    # Import only after the environment is set - the backend reads config at import time
+    from backend.gemini_client import gemini_client
+    from backend.metrics import metrics
+    from backend.main import app
+
+    fake_model = FakeGenerativeModel(args.gemini_latency_ms, args.gemini_jitter,
+                                     args.prompt_tokens, args.completion_tokens, seed=args.seed)
+    gemini_client.model = fake_model
+
+    server, thread = start_server(app, args.port)
+    try:
+        print(f"Sending {args.requests} requests at concurrency {args.concurrency} "
+              f"(fake Gemini {args.gemini_latency_ms:.0f}ms, dictionary stub {args.dictionary_latency_ms:.0f}ms)")
+        load = run_load(f"http://127.0.0.1:{args.port}", args, load_documents())
+    finally:
+        server.should_exit = True
+        thread.join()
+        dictionary.close()
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'config': vars(args),
+        'load': load,
+        'stages': stage_breakdown(metrics.snapshot()),
+        'backends': {
+            'gemini_calls': fake_model.calls,
+            'dictionary_requests': dictionary.requests,
+            'dictionary_connections': dictionary.connections,
+        },
+    }
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(result, json.load(f))
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: prompt size before and after prompt compaction
+For each document in sample_data/ compares the analysis prompt as it used to be
+sent (raw document in the indented template, indented system prompt) with the
+compacted prompt, using the local token estimate. Pass --count-tokens to also
+ask the Gemini API for exact counts (needs GEMINI_API_KEY)
+"""
+import sys
+import os
+import time
+import textwrap
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.config import config
+from backend.compaction import compact_document, estimate_text_tokens
+from backend.gemini_client import gemini_client
+from backend.routing import model_router
+
+# The analysis prompt before compaction: the template's source indentation was sent as is
+LEGACY_PROMPT = """
+            Analyze this legal document and provide a clear, structured summary.
+
+            Document:
+            {text}
+
+            Provide:
+            1. Document type (e.g., NDA, Employment Agreement, etc.)
+            2. Key parties involved
+            3. Important dates and terms
+            4. Main obligations and rights
+            5. Notable clauses or risks
+            6. **List any specialized legal terms or jargon that appear in the document** (e.g., indemnification, force majeure, arbitration, etc.)
+
+            Format your response EXACTLY like this:
+
+            Document Type: [type]
+
+            Summary:
+            [Your detailed summary here]
+
+            Legal Terms Found:
+            - term1: definition1
+            - term2: definition2
+            - term3: definition3
+        """
+
+LEGACY_SYSTEM_PROMPT = "\n" + textwrap.indent(config.SYSTEM_PROMPT, " " * 8) + "\n        "
+
+
+def load_samples():
+    """(name, text) for every file in sample_data/"""
+    samples = []
+    for name in sorted(os.listdir('sample_data')):
+        with open(os.path.join('sample_data', name), 'r') as f:
+            samples.append((name, f.read()))
+    return samples
+
+
+def count_tokens_remote():
+    """Token counter backed by the Gemini API, or None if it isn't available"""
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        model = genai.GenerativeModel(config.GEMINI_MODEL)
+        model.count_tokens("ping")
+    except Exception as e:
+        print(f"   Gemini token counting unavailable ({e.__class__.__name__}), using estimates only")
+        return None
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+def bench_document(name, text, iterations, count_tokens):
+    """Sizes of the legacy and compacted prompts for one document"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        document = compact_document(text)
+    compact_us = (time.perf_counter() - start) / iterations * 1e6
+
+    before = LEGACY_PROMPT.format(text=text)
+    after = gemini_client._build_prompt(document)
+    result = {
+        'name': name,
+        'before_tokens': estimate_text_tokens(before) + estimate_text_tokens(LEGACY_SYSTEM_PROMPT),
+        'after_tokens': estimate_text_tokens(after) + estimate_text_tokens(config.SYSTEM_PROMPT),
+        'document_saved': estimate_text_tokens(text) - estimate_text_tokens(document),
+        'compact_us': compact_us,
+        'tier': model_router.route(document).tier,
+    }
+    if count_tokens is not None:
+        result['before_actual'] = count_tokens(LEGACY_SYSTEM_PROMPT + before)
+        result['after_actual'] = count_tokens(config.SYSTEM_PROMPT + after)
+    return result
+
+
+def report(results):
+    print(f"\n{'document':<36} {'before':>8} {'after':>8} {'saved':>7} {'doc only':>9} {'compact':>10}  tier")
+    for r in results:
+        saved = r['before_tokens'] - r['after_tokens']
+        print(f"{r['name']:<36} {r['before_tokens']:>8} {r['after_tokens']:>8} "
+              f"{saved / r['before_tokens'] * 100:>6.1f}% {r['document_saved']:>9} "
+              f"{r['compact_us']:>8.1f}us  {r['tier']}")
+        if 'before_actual' in r:
+            print(f"{'   (Gemini count)':<36} {r['before_actual']:>8} {r['after_actual']:>8} "
+                  f"{(r['before_actual'] - r['after_actual']) / r['before_actual'] * 100:>6.1f}%")
+
+    before = sum(r['before_tokens'] for r in results)
+    after = sum(r['after_tokens'] for r in results)
+    print(f"\nTotal estimated prompt tokens: {before} -> {after} "
+          f"({(before - after) / before * 100:.1f}% fewer, {(before - after) / len(results):.0f} per request)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200, help='compaction runs per document for timing')
+    parser.add_argument('--count-tokens', action='store_true', help='also count tokens with the Gemini API')
+    args = parser.parse_args()
+
+    count_tokens = count_tokens_remote() if args.count_tokens else None
+    results = [bench_document(name, text, args.iterations, count_tokens) for name, text in load_samples()]
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: cold import time of the backend and time to the first
+served request, for short-lived workers and CLI tools
+
+Each measurement runs in a fresh Python process with its data files in a
+scratch directory. Import time is reported for backend.main and for the
+modules CLI tools use on their own; time to first request starts a uvicorn
+server and polls GET /api/summaries until it answers. Results are saved as
+JSON; pass --compare with an earlier result file to see the difference.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import requests
+
+# Modules timed on their own: the server entry point and what CLI tools import
+IMPORT_TARGETS = ["backend.main", "backend.gemini_client", "backend.safety", "backend.telemetry"]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def scratch_environment(data_dir):
+    """Environment for child processes with every data file in a scratch directory"""
+    env = dict(os.environ)
+    env.update({
+        'GEMINI_API_KEY': 'offline-benchmark',
+        'LOG_FILE': os.path.join(data_dir, 'logs.json'),
+        'SUMMARIES_FILE': os.path.join(data_dir, 'summaries.json'),
+        'SUMMARIES_DB': os.path.join(data_dir, 'summaries.db'),
+        'BATCHES_DB': os.path.join(data_dir, 'batches.db'),
+        'ANALYSIS_CACHE_DIR': os.path.join(data_dir, 'cache', 'analysis'),
+        'CLAUSE_CACHE_DIR': os.path.join(data_dir, 'cache', 'clauses'),
+        'DEFINITION_CACHE_FILE': os.path.join(data_dir, 'cache', 'definitions.json'),
+        'SIMILARITY_INDEX_FILE': os.path.join(data_dir, 'similarity_index.ndjson'),
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    return env
+
+
+def stats(samples_ms):
+    """Summary statistics for a list of durations in milliseconds"""
+    return {
+        'runs': len(samples_ms),
+        'median_ms': statistics.median(samples_ms) if samples_ms else 0.0,
+        'min_ms': min(samples_ms) if samples_ms else 0.0,
+        'max_ms': max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def time_import(module, env, runs):
+    """Wall time of `import module` in fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(module=module)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return stats(samples)
+
+
+def import_breakdown(env):
+    """Cumulative import time (ms) of each backend module, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import backend.main'],
+        env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    breakdown = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if name.startswith('backend.'):
+            breakdown[name] = int(cumulative) / 1000
+    return breakdown
+
+
+def time_first_request(env, port, timeout):
+    """Seconds from spawning the server to its first answered request, and that request's latency"""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--host', '127.0.0.1',
+         '--port', str(port), '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/api/summaries"
+    try:
+        while time.perf_counter() - start < timeout:
+            request_start = time.perf_counter()
+            try:
+                response = requests.get(url, timeout=timeout)
+            except requests.ConnectionError:
+                time.sleep(0.01)
+                continue
+            if response.status_code == 200:
+                now = time.perf_counter()
+                return (now - start) * 1000, (now - request_start) * 1000
+        raise RuntimeError(f"Server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_report(result):
+    print("\nImport time (fresh interpreter):")
+    for module, s in result['imports'].items():
+        print(f"   {module:<24} median={s['median_ms']:>8.1f}ms  min={s['min_ms']:>8.1f}ms")
+
+    print("\nbackend.main import breakdown (cumulative):")
+    for module, ms in sorted(result['breakdown'].items(), key=lambda item: -item[1]):
+        print(f"   {module:<24} {ms:>8.1f}ms")
+
+    first = result['first_request']
+    print("\nTime to first served request:")
+    print(f"   spawn -> first response  median={first['ready']['median_ms']:>8.1f}ms  "
+          f"min={first['ready']['min_ms']:>8.1f}ms")
+    print(f"   first request latency    median={first['latency']['median_ms']:>8.1f}ms")
+
+
+def print_comparison(result, baseline):
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {baseline['timestamp']}:")
+    for module, s in result['imports'].items():
+        previous = baseline.get('imports', {}).get(module)
+        if previous:
+            print(f"   import {module}: {previous['median_ms']:.1f} -> {s['median_ms']:.1f}ms "
+                  f"({change(s['median_ms'], previous['median_ms'])})")
+    old = baseline['first_request']['ready']['median_ms']
+    new = result['first_request']['ready']['median_ms']
+    print(f"   time to first request: {old:.1f} -> {new:.1f}ms ({change(new, old)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per measurement')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for the server')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/startup_<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    env = scratch_environment(tempfile.mkdtemp(prefix='bench_startup_'))
+
+    print(f"Timing imports and server start over {args.runs} fresh processes each...")
+    imports = {module: time_import(module, env, args.runs) for module in IMPORT_TARGETS}
+    ready, latency = [], []
+    for _ in range(args.runs):
+        ready_ms, latency_ms = time_first_request(env, args.port, args.timeout)
+        ready.append(ready_ms)
+        latency.append(latency_ms)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'config': vars(args),
+        'imports': imports,
+        'breakdown': import_breakdown(env),
+        'first_request': {'ready': stats(ready), 'latency': stats(latency)},
+    }
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(result, json.load(f))
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: offline legal glossary vs. dictionary API term lookup
+Reports per-lookup latency for the bundled glossary index and the HTTP path
+"""
+import sys
+import os
+import time
+import statistics
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+from backend.glossary import LegalGlossary, legal_glossary
+
+TERMS = [
+    "indemnification", "arbitration", "force majeure", "liquidated damages",
+    "confidentiality", "severability", "indemnities", "non-compete",
+    "governing law", "breach",
+]
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples_us):
+    """Print latency stats in microseconds"""
+    print(f"{name:<20} n={len(samples_us):<7} "
+          f"mean={statistics.mean(samples_us):>12.2f}us  "
+          f"p50={percentile(samples_us, 50):>12.2f}us  "
+          f"p99={percentile(samples_us, 99):>12.2f}us")
+
+
+def bench_glossary(iterations):
+    """Time glossary index lookups"""
+    samples = []
+    for _ in range(iterations):
+        for term in TERMS:
+            start = time.perf_counter()
+            legal_glossary.lookup(term)
+            samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def bench_phrase_scan():
+    """Time a full phrase scan over the sample documents"""
+    samples = []
+    for name in sorted(os.listdir('sample_data')):
+        with open(os.path.join('sample_data', name), 'r') as f:
+            text = f.read()
+        start = time.perf_counter()
+        found = legal_glossary.find_terms(text)
+        samples.append((time.perf_counter() - start) * 1e6)
+        print(f"   {name}: {len(text)} chars, {len(found)} terms")
+    return samples
+
+
+def bench_http():
+    """Time dictionary API lookups (one request per term)"""
+    samples = []
+    for term in TERMS:
+        url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{term}"
+        start = time.perf_counter()
+        try:
+            requests.get(url, timeout=5)
+        except requests.RequestException as e:
+            print(f"   HTTP lookup failed for '{term}': {e.__class__.__name__}")
+            continue
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=10000)
+    parser.add_argument('--skip-http', action='store_true', help="don't call the dictionary API")
+    args = parser.parse_args()
+
+    print(f"\nGlossary entries: {len(legal_glossary)}\n")
+
+    start = time.perf_counter()
+    len(LegalGlossary())  # the index is built on first use
+    print(f"Glossary load time: {(time.perf_counter() - start) * 1000:.2f}ms\n")
+
+    report("glossary lookup", bench_glossary(args.iterations))
+
+    print("\nPhrase scan over sample_data/:")
+    report("glossary scan", bench_phrase_scan())
+
+    if not args.skip_http:
+        print("\nDictionary API:")
+        samples = bench_http()
+        if samples:
+            report("http lookup", samples)
+        else:
+            print("   No successful HTTP lookups (network unavailable?)")
+
+
+if __name__ == "__main__":
+    main()
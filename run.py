@@ -2,6 +2,8 @@
 """
 One-command startup script for Legal Document Analyzer
 """
+import argparse
+import uuid
 import uvicorn
 import os
 import sys
@@ -21,18 +23,63 @@ def check_env():
     
     print("Configuration validated\n")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the Legal Document Analyzer server")
+    parser.add_argument("--prod", action="store_true",
+                        help="Production mode: several workers, no auto-reload")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    return parser.parse_args()
+
+def production_workers(requested):
+    """Worker count for production mode, capped to 1 where files can't be locked"""
+    from backend.locks import PROCESS_LOCKS_AVAILABLE
+    workers = requested or os.cpu_count() or 1
+    if workers > 1 and not PROCESS_LOCKS_AVAILABLE:
+        print("⚠️  File locking is not available on this platform, running a single worker")
+        return 1
+    return workers
+
 def main():    
+    args = parse_args()
     check_env()
-    
-    print("Starting server...")
-    print("Server will be available at: http://localhost:8000")
-    print("\nPress CTRL+C to stop the server\n")
-    
+
+    if not args.prod:
+        print("Starting server...")
+        print(f"Server will be available at: http://localhost:{args.port}")
+        print("\nPress CTRL+C to stop the server\n")
+
+        uvicorn.run(
+            "backend.main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    workers = production_workers(args.workers)
+    # Read by the workers: they split the Gemini quota and share one boot ID
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ.setdefault("APP_BOOT_ID", uuid.uuid4().hex)
+    from backend.config import config
+
+    print(f"Starting server in production mode with {workers} worker(s)...")
+    print(f"Server will be available at: http://{args.host}:{args.port}")
+    print("\nPress CTRL+C (or send SIGTERM) to drain and stop the server\n")
+
+    # On shutdown uvicorn stops accepting connections, waits for in-flight
+    # requests up to the grace period, then runs each worker's shutdown hook
     uvicorn.run(
         "backend.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=False,
+        proxy_headers=True,
+        timeout_graceful_shutdown=config.SHUTDOWN_GRACE_SECONDS,
         log_level="info"
     )
 
@@ -0,0 +1,93 @@
+"""
+Shared setup for the offline pytest suite
+
+Every data file points into a throwaway directory and nothing talks to
+Gemini or the dictionary API. The environment is set before any backend
+module is imported, since Config reads it at import time.
+
+Run from the repository root with: python -m pytest -q tests
+"""
+import os
+import sys
+import asyncio
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="legal-analyzer-tests-")
+
+os.environ.update({
+    'LOG_FILE': os.path.join(DATA_DIR, 'logs.json'),
+    'SUMMARIES_FILE': os.path.join(DATA_DIR, 'summaries.json'),
+    'SUMMARIES_DB': os.path.join(DATA_DIR, 'summaries.db'),
+    'BATCHES_DB': os.path.join(DATA_DIR, 'batches.db'),
+    'ANALYSIS_CACHE_DIR': os.path.join(DATA_DIR, 'cache', 'analysis'),
+    'CLAUSE_CACHE_DIR': os.path.join(DATA_DIR, 'cache', 'clauses'),
+    'DEFINITION_CACHE_FILE': os.path.join(DATA_DIR, 'cache', 'definitions.json'),
+    'SIMILARITY_INDEX_FILE': os.path.join(DATA_DIR, 'similarity_index.ndjson'),
+    'GEMINI_API_KEY': 'test-key',
+    'ANALYSIS_CACHE_ENABLED': 'false',
+    'SIMILARITY_ENABLED': 'false',
+    'TERM_PREFETCH_ENABLED': 'false',
+    'DEFINITION_REMOTE_FALLBACK': 'false',
+    'GEMINI_RETRY_BASE_DELAY': '0.01',
+    'GEMINI_RETRY_MAX_DELAY': '0.05',
+})
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+# Static files and sample documents are resolved relative to the repository root
+os.chdir(ROOT)
+
+SUMMARY_TEXT = (
+    "Document Type: NDA\n\n"
+    "Summary:\nThe parties agree to keep information confidential.\n\n"
+    "Legal Terms Found:\n- indemnification: compensation for loss\n"
+)
+
+
+class Usage:
+    prompt_token_count = 100
+    candidates_token_count = 50
+    total_token_count = 150
+
+
+class Response:
+    """Just enough of a Gemini response for the client to parse"""
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text]
+        self.usage_metadata = Usage()
+        self.candidates = []
+
+
+class Stream:
+    """Async iterator of response chunks, like a streamed Gemini call"""
+
+    def __init__(self, text, delay):
+        self.text = text
+        self.delay = delay
+
+    async def __aiter__(self):
+        for i in range(0, len(self.text), 40):
+            await asyncio.sleep(self.delay / 5)
+            yield Response(self.text[i:i + 40])
+
+
+class FakeModel:
+    """Stand-in for a GenerativeModel that counts calls and answers after a delay"""
+
+    def __init__(self, delay=0.2, text=SUMMARY_TEXT):
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return Response(self.text)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return Stream(self.text, self.delay)
+        await asyncio.sleep(self.delay)
+        return Response(self.text)
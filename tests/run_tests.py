@@ -2,17 +2,27 @@
 """
 Automated test suite for Legal Document Analyzer
 Runs all tests from tests.json and reports pass rate
+
+Tests run concurrently (--jobs); model calls go through the backend's
+outbound scheduler, which enforces the requests/tokens-per-minute quota and
+backs off when the API answers 429
 """
 import sys
 import os
 import json
 import time
+import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from backend.config import config
 from backend.safety import safety_checker
 from backend.gemini_client import gemini_client
+from backend.metrics import metrics
+from backend.rate_limit import RateLimiter
+from backend.scheduler import gemini_scheduler, ModelBusyError
 
 
 def load_tests():
@@ -22,7 +32,11 @@ def load_tests():
 
 
 def run_single_test(test):
-    """Run a single test case"""
+    """Run a single test case
+    Returns: (passed, elapsed, output lines) - output is buffered so concurrent tests don't interleave
+    """
+    output = []
+    log = output.append
     test_id = test['id']
     test_name = test['name']
     input_text = test['input']
@@ -30,9 +44,9 @@ def run_single_test(test):
     should_trigger_tool = test.get('should_trigger_tool', False)
     should_fail = test.get('should_fail', False)
 
-    print(f"\n{'-'*100}\n")
-    print(f"Test: {test_id} - {test_name}")
-    print(f"Description: {test.get('description', 'N/A')}")
+    log(f"\n{'-'*100}\n")
+    log(f"Test: {test_id} - {test_name}")
+    log(f"Description: {test.get('description', 'N/A')}")
 
     start_time = time.time()
 
@@ -41,17 +55,22 @@ def run_single_test(test):
 
     if should_fail:
         if not valid:
-            print(f"PASS - Correctly rejected: {error_msg}")
-            return True, time.time() - start_time
-        print("FAIL - Should have been rejected but wasn't")
-        return False, time.time() - start_time
+            log(f"PASS - Correctly rejected: {error_msg}")
+            return True, time.time() - start_time, output
+        log("FAIL - Should have been rejected but wasn't")
+        return False, time.time() - start_time, output
 
     if not valid:
-        print(f"FAIL - Validation error: {error_msg}")
-        return False, time.time() - start_time
+        log(f"FAIL - Validation error: {error_msg}")
+        return False, time.time() - start_time, output
 
     # Run analysis
-    summary, terms_looked_up, usage = gemini_client.analyze_document(input_text)
+    try:
+        summary, terms_looked_up, usage = gemini_client.analyze_document(input_text)
+    except ModelBusyError as e:
+        # Out of quota even after retrying - fail this test, keep the rest of the run going
+        log(f"FAIL - {e}")
+        return False, time.time() - start_time, output
     summary_lower = summary.lower()
 
     patterns_found = [p for p in expected_patterns if p.lower() in summary_lower]
@@ -66,59 +85,74 @@ def run_single_test(test):
     overall_pass = patterns_pass and tool_check_passed
 
     # Results
-    print("\nResults:")
-    print(f"   Patterns found: {len(patterns_found)}/{len(expected_patterns)}")
+    log("\nResults:")
+    log(f"   Patterns found: {len(patterns_found)}/{len(expected_patterns)}")
 
     for p in patterns_found:
-        print(f"      YES {p}")
+        log(f"      YES {p}")
     for p in patterns_missing:
-        print(f"      NO {p}")
+        log(f"      NO {p}")
 
-    print(f"\n   Tool usage: {'PASSED' if tool_check_passed else 'FAILED'}")
-    print(f"      Expected: {should_trigger_tool}, Actual: {tool_triggered}")
+    log(f"\n   Tool usage: {'PASSED' if tool_check_passed else 'FAILED'}")
+    log(f"      Expected: {should_trigger_tool}, Actual: {tool_triggered}")
 
     if terms_looked_up:
-        print(f"      Terms: {', '.join(terms_looked_up)}")
+        log(f"      Terms: {', '.join(terms_looked_up)}")
 
-    print(f"\n   Tokens used: {usage.get('total_tokens', 0)}")
+    log(f"\n   Tokens used: {usage.get('total_tokens', 0)}")
 
     elapsed = time.time() - start_time
-    print(f"   Time: {elapsed:.2f}s")
+    log(f"   Time: {elapsed:.2f}s")
 
     if overall_pass:
-        print("\nPASS")
+        log("\nPASS")
     else:
-        print("\nFAIL")
+        log("\nFAIL")
         if not patterns_pass:
-            print(f"   Reason: Only {len(patterns_found)}/{len(expected_patterns)} patterns found")
+            log(f"   Reason: Only {len(patterns_found)}/{len(expected_patterns)} patterns found")
         if not tool_check_passed:
-            print("   Reason: Tool usage mismatch")
+            log("   Reason: Tool usage mismatch")
 
-    return overall_pass, elapsed
+    return overall_pass, elapsed, output
 
 
 def main():
     """Run all tests and report results"""
+    parser = argparse.ArgumentParser(description="Run the Legal Document Analyzer test suite")
+    parser.add_argument('--jobs', type=int, default=4, help='tests to run at the same time')
+    parser.add_argument('--rpm', type=int, default=config.GEMINI_RPM, help='model requests per minute quota')
+    parser.add_argument('--tpm', type=int, default=config.GEMINI_TPM, help='model tokens per minute quota')
+    args = parser.parse_args()
+
     print("\nTesting...")
     print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     tests = load_tests()
-    print(f"\nLoaded {len(tests)} test cases\n")
+    print(f"\nLoaded {len(tests)} test cases ({args.jobs} jobs, {args.rpm} RPM, {args.tpm} TPM)\n")
 
-    results = []
-    total_time = 0
+    gemini_scheduler.limiter = RateLimiter(args.rpm, args.tpm)
 
-    for test in tests:
-        passed, elapsed = run_single_test(test)
-        results.append({
-            'id': test['id'],
-            'name': test['name'],
-            'passed': passed,
-            'time': elapsed
-        })
-        total_time += elapsed
-
-        time.sleep(7)
+    results = {}
+    total_time = 0
+    wall_start = time.time()
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(run_single_test, test): test for test in tests}
+        for future in as_completed(futures):
+            test = futures[future]
+            passed, elapsed, output = future.result()
+            print("\n".join(output))
+            results[test['id']] = {
+                'id': test['id'],
+                'name': test['name'],
+                'passed': passed,
+                'time': elapsed
+            }
+            total_time += elapsed
+
+    # Keep the tests.json order in the report
+    results = [results[test['id']] for test in tests]
+    wall_time = time.time() - wall_start
 
     passed_count = sum(1 for r in results if r['passed'])
     failed_count = len(results) - passed_count
@@ -130,6 +164,9 @@ def main():
     print(f"Failed: {failed_count}")
     print(f"Pass rate: {pass_rate:.1f}%")
     print(f"Total time: {total_time:.2f}s")
+    print(f"Wall time: {wall_time:.2f}s")
+    retries = {r['labels']['reason']: r['value'] for r in metrics.snapshot()['counters'].get('gemini_retries_total', [])}
+    print(f"Rate limited (429) responses: {retries.get('rate_limited', 0):g}")
     print(f"Average time per test: {total_time/len(results):.2f}s")
 
     if failed_count > 0:
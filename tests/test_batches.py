@@ -0,0 +1,37 @@
+"""
+Batch jobs: per-document analysis mode
+"""
+import asyncio
+from types import SimpleNamespace
+
+from backend.batches import BatchRunner, BatchStore
+from backend.gemini_client import gemini_client
+from backend.models import AnalyzeRequest
+
+DOCUMENT = "1. Confidentiality. The receiving party shall keep the information secret.\n" * 3
+
+
+def test_documents_are_analyzed_in_their_requested_mode(tmp_path, monkeypatch):
+    modes = []
+
+    async def analyze(text, mode=None):
+        modes.append(mode)
+        return "summary", [], {'total_tokens': 1}
+
+    monkeypatch.setattr(gemini_client, "analyze_document_async", analyze)
+    runner = BatchRunner()
+    runner.store = BatchStore(str(tmp_path / "batches.db"))
+    runner._on_result = lambda request, *args: SimpleNamespace(saved_id=f"sum_{request.mode}")
+
+    job_id = runner.store.create_job([
+        AnalyzeRequest(text=DOCUMENT, document_name="a.txt", mode="clause"),
+        AnalyzeRequest(text=DOCUMENT, document_name="b.txt"),
+    ])
+    for idx in range(2):
+        asyncio.run(runner._run_document(job_id, idx))
+
+    assert modes == ["clause", None]
+    job = runner.store.get_job(job_id)
+    assert job['status'] == 'completed'
+    assert [doc['summary_id'] for doc in job['documents']] == ["sum_clause", "sum_None"]
+    runner.store.close()
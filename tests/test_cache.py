@@ -0,0 +1,43 @@
+"""
+Analysis cache: disk size limit without listing the directory on every write
+"""
+import os
+
+import backend.cache as cache
+from backend.cache import AnalysisCache
+
+
+def make_cache(tmp_path, max_disk_entries):
+    analysis_cache = AnalysisCache("test", str(tmp_path))
+    analysis_cache.enabled = True
+    analysis_cache.max_memory_entries = 1
+    analysis_cache.max_disk_entries = max_disk_entries
+    return analysis_cache
+
+
+def test_disk_stays_within_the_limit_with_few_directory_scans(tmp_path, monkeypatch):
+    listings = []
+    listdir = os.listdir
+
+    def counting_listdir(path):
+        listings.append(path)
+        return listdir(path)
+
+    monkeypatch.setattr(cache.os, "listdir", counting_listdir)
+    analysis_cache = make_cache(tmp_path, max_disk_entries=100)
+    for i in range(300):
+        analysis_cache.put(f"key{i:03d}", f"summary {i}", [])
+
+    on_disk = [name for name in listdir(tmp_path) if name.endswith('.json')]
+    assert len(on_disk) <= 100
+    assert len(listings) < 30
+    # The newest entries survive eviction
+    assert analysis_cache.get("key299")['summary'] == "summary 299"
+
+
+def test_rewriting_an_entry_does_not_grow_the_count(tmp_path):
+    analysis_cache = make_cache(tmp_path, max_disk_entries=5)
+    for _ in range(20):
+        analysis_cache.put("same", "summary", [])
+    assert analysis_cache._disk_entries == 1
+    assert analysis_cache.get("same") is not None
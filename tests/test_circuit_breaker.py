@@ -0,0 +1,104 @@
+"""
+Circuit breaker: opening on failures, half-open probes, closing and re-opening
+"""
+import time
+
+import pytest
+
+from backend.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+def make_breaker(open_seconds=0.05, half_open_probes=1):
+    return CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, slow_call_ms=1000,
+                          open_seconds=open_seconds, half_open_probes=half_open_probes)
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(False)
+
+
+def test_opens_once_the_failure_rate_is_reached():
+    breaker = make_breaker()
+    breaker.before_call()
+    breaker.record(True, 10)
+    fail(breaker, 1)
+    breaker.before_call()
+    breaker.record(True, 10)
+    assert breaker.state == CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+
+
+def test_waits_for_the_minimum_number_of_calls():
+    breaker = make_breaker()
+    fail(breaker, 3)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.before_call()
+        breaker.record(True, 5000)
+    assert breaker.state == OPEN
+
+
+def test_rejects_calls_while_open():
+    breaker = make_breaker(open_seconds=30)
+    fail(breaker, 4)
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= 30
+
+
+def test_half_open_probe_success_closes_the_circuit():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True, 10)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_half_open_probe_failure_reopens_the_circuit():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_slot_can_be_reused():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_transitions_are_reported():
+    states = []
+    breaker = CircuitBreaker(window=2, min_calls=2, failure_rate=0.5, slow_call_ms=1000,
+                             open_seconds=0.01, on_transition=states.append)
+    fail(breaker, 2)
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record(True, 1)
+    assert states == [OPEN, HALF_OPEN, CLOSED]
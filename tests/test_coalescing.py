@@ -0,0 +1,83 @@
+"""
+Request coalescing: identical concurrent analyses share one model call
+"""
+import asyncio
+
+import pytest
+
+from backend.gemini_client import gemini_client
+from conftest import FakeModel
+
+DOCUMENT = (
+    "This Non-Disclosure Agreement is made between Company A and Company B. "
+    "The receiving party shall keep all confidential information secret for two years "
+    "and shall indemnify the disclosing party for any breach."
+)
+
+
+@pytest.fixture
+def model():
+    previous = gemini_client._model
+    fake = FakeModel(delay=0.2)
+    gemini_client.model = fake
+    yield fake
+    gemini_client.model = previous
+
+
+async def collect_stream(text):
+    events = [event async for event in gemini_client.analyze_document_stream(text)]
+    return events[-1]
+
+
+def test_identical_requests_share_one_model_call(model):
+    async def main():
+        return await asyncio.gather(*(gemini_client.analyze_document_async(DOCUMENT) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert model.calls == 1
+    assert len({summary for summary, _, _ in results}) == 1
+    # Everyone but the request that made the call is marked as coalesced
+    assert sum(1 for _, _, usage in results if usage.get('coalesced')) == 3
+
+
+def test_whitespace_differences_still_coalesce(model):
+    async def main():
+        return await asyncio.gather(
+            gemini_client.analyze_document_async(DOCUMENT),
+            gemini_client.analyze_document_async("  " + DOCUMENT.replace(". ", ".\n\n") + "\n"),
+        )
+
+    asyncio.run(main())
+    assert model.calls == 1
+
+
+def test_streams_and_plain_requests_share_one_model_call(model):
+    async def main():
+        return await asyncio.gather(
+            collect_stream(DOCUMENT),
+            collect_stream(DOCUMENT),
+            gemini_client.analyze_document_async(DOCUMENT),
+        )
+
+    first, second, (summary, _, _) = asyncio.run(main())
+    assert model.calls == 1
+    assert first['type'] == second['type'] == 'done'
+    assert first['summary'] == second['summary'] == summary
+
+
+def test_different_documents_are_not_coalesced(model):
+    async def main():
+        await asyncio.gather(
+            gemini_client.analyze_document_async(DOCUMENT),
+            gemini_client.analyze_document_async(DOCUMENT + " It is governed by Delaware law."),
+        )
+
+    asyncio.run(main())
+    assert model.calls == 2
+
+
+def test_in_flight_entry_is_cleared_after_the_call(model):
+    asyncio.run(gemini_client.analyze_document_async(DOCUMENT))
+    asyncio.run(gemini_client.analyze_document_async(DOCUMENT))
+    assert model.calls == 2
+    assert not gemini_client._in_flight
@@ -0,0 +1,50 @@
+"""
+Term prefetch: only lookups that would go to the network count as hits or misses
+"""
+import asyncio
+import time
+
+import pytest
+
+from backend.config import config
+from backend.metrics import metrics
+from backend.tools import LegalTermLookup, TermPrefetch, definition_cache
+
+DEFINITION = {'term': "", 'definition': "", 'source': "test"}
+
+
+def prefetch_counts():
+    counters = metrics.snapshot()['counters'].get('term_prefetch_total', [])
+    return {counter['labels']['result']: counter['value'] for counter in counters}
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    monkeypatch.setattr(config, "DEFINITION_REMOTE_FALLBACK", True)
+
+    async def lookup(term):
+        return dict(DEFINITION, term=term)
+
+    monkeypatch.setattr(LegalTermLookup, "lookup_async", lookup)
+
+
+def test_only_terms_needing_a_round_trip_are_counted(remote):
+    # Expired: a prefetch candidate; fresh: answered from the cache
+    definition_cache.put("estoppel", dict(DEFINITION, term="estoppel"))
+    definition_cache._entries["estoppel"]['expires_at'] = time.time() - 1
+    definition_cache.put("laches", dict(DEFINITION, term="laches"))
+    before = prefetch_counts()
+
+    async def main():
+        prefetch = TermPrefetch("The doctrine of estoppel and laches bars the claim.")
+        try:
+            # Glossary term, fresh cache hit, prefetched term, term never looked up
+            return await prefetch.reconcile(["indemnification", "laches", "estoppel", "zzyzx clause"])
+        finally:
+            prefetch.close()
+
+    matched = asyncio.run(main())
+    assert list(matched) == [2]
+    after = prefetch_counts()
+    assert after.get('hit', 0) - before.get('hit', 0) == 1
+    assert after.get('miss', 0) - before.get('miss', 0) == 1
@@ -0,0 +1,202 @@
+"""
+Outbound scheduler: priority order, RPM/TPM quota, retries and hedging
+"""
+import asyncio
+import time
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
+from backend.config import config
+from backend.scheduler import GeminiScheduler, ModelBusyError, PRIORITY_BATCH, PRIORITY_INTERACTIVE, set_priority
+from conftest import Response
+
+
+def make_scheduler(max_concurrency=1, rpm=100_000, tpm=100_000_000):
+    scheduler = GeminiScheduler(max_concurrency, rpm, tpm)
+    scheduler.breaker = None
+    scheduler.hedge_enabled = False
+    return scheduler
+
+
+def test_interactive_calls_go_ahead_of_queued_batch_work():
+    scheduler = make_scheduler(max_concurrency=1)
+    order = []
+
+    async def call_as(name, priority):
+        set_priority(priority)
+
+        async def call():
+            order.append(name)
+            await asyncio.sleep(0.01)
+            return Response(name)
+
+        return await scheduler.run(call, estimated_tokens=10)
+
+    async def main():
+        # The first batch call takes the only slot; the rest queue behind it
+        tasks = [asyncio.create_task(call_as(f"batch{i}", PRIORITY_BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call_as(f"interactive{i}", PRIORITY_INTERACTIVE)) for i in range(2)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["batch0", "interactive0", "interactive1", "batch1", "batch2"]
+
+
+def test_token_quota_delays_calls_until_the_bucket_refills():
+    # 600 tokens per minute refills 10 tokens per second
+    scheduler = make_scheduler(max_concurrency=4, tpm=600)
+
+    async def call():
+        # No usage reported, so the estimate is what gets charged
+        response = Response("ok")
+        response.usage_metadata = None
+        return response
+
+    async def main():
+        await scheduler.run(call, estimated_tokens=600)
+        start = time.monotonic()
+        await scheduler.run(call, estimated_tokens=5)
+        return time.monotonic() - start
+
+    waited = asyncio.run(main())
+    assert 0.3 <= waited < 2.0
+
+
+def test_request_quota_is_shared_by_concurrent_callers():
+    # Capacity of 2 requests, refilling one every 0.5s
+    scheduler = make_scheduler(max_concurrency=4, rpm=120)
+    scheduler.limiter.requests.tokens = 2
+
+    async def call():
+        return Response("ok")
+
+    async def main():
+        start = time.monotonic()
+        await asyncio.gather(*(scheduler.run(call, estimated_tokens=1) for _ in range(3)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(main())
+    assert elapsed >= 0.4
+
+
+def test_rate_limited_calls_are_retried():
+    scheduler = make_scheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ResourceExhausted("Quota exceeded, retry in 0.05s")
+        if len(attempts) == 2:
+            raise ServiceUnavailable("overloaded")
+        return Response("ok")
+
+    response = asyncio.run(scheduler.run(call, estimated_tokens=10))
+    assert response.text == "ok"
+    assert len(attempts) == 3
+
+
+def test_gives_up_with_model_busy_after_the_last_retry():
+    scheduler = make_scheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ResourceExhausted("Quota exceeded")
+
+    with pytest.raises(ModelBusyError) as error:
+        asyncio.run(scheduler.run(call, estimated_tokens=10))
+    assert len(attempts) == config.GEMINI_MAX_RETRIES + 1
+    assert error.value.retry_after >= 1.0
+
+
+def test_runner_records_a_busy_model_as_a_failed_test(monkeypatch):
+    import run_tests
+    from backend.gemini_client import gemini_client
+
+    def busy(text):
+        raise ModelBusyError(30)
+
+    monkeypatch.setattr(gemini_client, "analyze_document", busy)
+    passed, _, output = run_tests.run_single_test({'id': "test_x", 'name': "busy", 'input': "A valid contract. " * 5})
+    assert not passed
+    assert any("retry in 30s" in line for line in output)
+
+
+def test_hedge_answers_when_the_first_call_is_slow(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_HEDGE_MIN_DELAY_MS", 50)
+    scheduler = make_scheduler(max_concurrency=2)
+    scheduler.hedge_enabled = True
+    calls = []
+
+    async def call():
+        calls.append(1)
+        # The first copy hangs; the hedged copy answers straight away
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+            return Response("primary")
+        return Response("hedge")
+
+    async def main():
+        start = time.monotonic()
+        response = await scheduler.run(call, estimated_tokens=10)
+        return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(main())
+    assert response.text == "hedge"
+    assert len(calls) == 2
+    assert elapsed < 1.0
+
+
+def test_no_hedge_when_the_call_is_fast(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_HEDGE_MIN_DELAY_MS", 200)
+    scheduler = make_scheduler(max_concurrency=2)
+    scheduler.hedge_enabled = True
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return Response("primary")
+
+    response = asyncio.run(scheduler.run(call, estimated_tokens=10))
+    assert response.text == "primary"
+    assert len(calls) == 1
+
+
+def test_cancelled_caller_cancels_the_primary_call(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_HEDGE_MIN_DELAY_MS", 5000)
+    scheduler = make_scheduler(max_concurrency=2)
+    scheduler.hedge_enabled = True
+    cancelled = []
+
+    async def call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return Response("late")
+
+    async def main():
+        task = asyncio.create_task(scheduler.run(call, estimated_tokens=10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run cancels whatever is left over
+        assert cancelled == [1]
+        assert scheduler._in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_hedge_delay_uses_any_configured_quantile(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_HEDGE_MIN_DELAY_MS", 0)
+    monkeypatch.setattr(config, "GEMINI_HEDGE_QUANTILE", 0.9)
+    scheduler = make_scheduler()
+    for latency in range(1, 101):
+        scheduler._latency.observe(latency)
+    assert scheduler._hedge_delay() == 91
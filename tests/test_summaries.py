@@ -0,0 +1,109 @@
+"""
+Summary listing: cursor pagination, filters and cursor validation
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.storage import SummaryRepository
+from backend.telemetry import inclusive_end
+
+
+def make_record(i, day=15, document_name="nda.txt"):
+    return {
+        'id': f"sum_{i:03d}",
+        'timestamp': f"2024-01-{day:02d}T{i % 24:02d}:00:00",
+        'document_name': document_name,
+        'summary': f"summary {i}",
+        'terms_looked_up': ["indemnification"],
+        'tokens_used': 100,
+        'input_length': 500,
+    }
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SummaryRepository(str(tmp_path / "summaries.db"))
+    yield repository
+    repository.close()
+
+
+def list_all(repository, limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        records, cursor = repository.list(limit, cursor, **filters)
+        pages.append(records)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_record_once_newest_first(repository):
+    repository.add_many([make_record(i) for i in range(23)])
+
+    pages = list_all(repository, limit=10)
+    assert [len(page) for page in pages] == [10, 10, 3]
+    ids = [record['id'] for page in pages for record in page]
+    assert ids == [f"sum_{i:03d}" for i in reversed(range(23))]
+    assert all('summary' not in record for page in pages for record in page)
+
+
+def test_exact_multiple_of_the_page_size_has_no_empty_last_page(repository):
+    repository.add_many([make_record(i) for i in range(20)])
+    assert [len(page) for page in list_all(repository, limit=10)] == [10, 10]
+
+
+def test_records_added_between_pages_do_not_shift_the_cursor(repository):
+    repository.add_many([make_record(i) for i in range(5)])
+    first, cursor = repository.list(2)
+    repository.add(make_record(99))
+    second, _ = repository.list(2, cursor)
+    assert [record['id'] for record in first + second] == ["sum_004", "sum_003", "sum_002", "sum_001"]
+
+
+def test_filters_apply_across_pages(repository):
+    repository.add_many([make_record(i, document_name="a.txt" if i % 2 else "b.txt") for i in range(9)])
+    ids = [record['id'] for page in list_all(repository, limit=2, document_name="a.txt") for record in page]
+    assert ids == ["sum_007", "sum_005", "sum_003", "sum_001"]
+
+
+def test_date_only_end_includes_the_whole_day(repository):
+    repository.add_many([make_record(i, day=day) for i, day in enumerate([14, 15, 15, 16])])
+    records, _ = repository.list(10, start="2024-01-15", end=inclusive_end("2024-01-15"))
+    assert [record['id'] for record in records] == ["sum_002", "sum_001"]
+
+
+def test_queued_records_are_visible_to_reads(repository):
+    for i in range(5):
+        repository.add_later(make_record(i))
+    assert repository.count() == 5
+    assert repository.get("sum_004")['summary'] == "summary 4"
+
+
+def test_api_rejects_a_malformed_cursor():
+    from backend.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/api/summaries?cursor=abc").status_code == 400
+        assert client.get("/api/summaries?cursor=-1").status_code == 400
+        response = client.get("/api/summaries?limit=5")
+        assert response.status_code == 200
+        assert set(response.json()) == {"summaries", "next_cursor"}
+
+
+def test_summaries_saved_after_a_restart_reach_the_store():
+    from backend.main import app
+    from backend.models import Summary
+    from backend.telemetry import telemetry_logger
+
+    # Two server lifetimes in one process, as with a reused TestClient
+    with TestClient(app):
+        pass
+    with TestClient(app) as client:
+        telemetry_logger.save_summary(Summary(
+            id="sum_restart", timestamp="2024-02-01T10:00:00", document_name="restart.txt",
+            summary="saved after restart", terms_looked_up=[], tokens_used=1, input_length=10,
+        ))
+        # In SQLite, not just the NDJSON fallback file
+        assert telemetry_logger.summary_store.get("sum_restart")['summary'] == "saved after restart"
+        ids = [record['id'] for record in client.get("/api/summaries").json()['summaries']]
+        assert "sum_restart" in ids